@@ -1,21 +1,59 @@
+import argparse
+import getpass
+import queue
 import re
+import threading
+import time
 import warnings
 from functools import partial
-from itertools import product
 from pathlib import Path
 
+import astropy.io.fits as pf
 import astropy.units as u
 import customtkinter as ctk
 import matplotlib as mpl
 import numpy as np
 import tomlkit
-from astropy.coordinates import SkyCoord
-from astropy.table import QTable
+from astropy.coordinates import SkyCoord, concatenate
+from astropy.table import QTable, vstack
+from astropy.wcs import WCS
 from CTkMessagebox import CTkMessagebox
-from tqdm import tqdm
 
 from pygcg.tabs import BeamFrame, SpecFrame
-from pygcg.utils import ValidateFloatVar, check_deg, flatten_dict, fpe
+from pygcg.utils import (
+    CatalogueWriter,
+    ClassificationDatabase,
+    ClassificationJournal,
+    GrizliSummary,
+    HDUOffsetIndex,
+    ObjectQueue,
+    ProductIndex,
+    ProductWatcher,
+    StackProduct,
+    ValidateFloatVar,
+    beam_names,
+    catalogue_columns,
+    check_deg,
+    config_signature,
+    decode_quality,
+    encode_record,
+    export_catalogue,
+    file_stamps,
+    flatten_dict,
+    fpe,
+    grism_names,
+    index_rows,
+    merge_classifications,
+    migrate_output,
+    output_table,
+    pixel_coordinates,
+    read_catalogue,
+    read_classifications,
+    read_session,
+    unpack_flags,
+    update_record,
+    write_session,
+)
 from pygcg.windows import CommentsWindow, SearchWindow, SettingsWindow
 
 warnings.filterwarnings("ignore")
@@ -140,17 +178,10 @@ class GCG(ctk.CTk):
         )
 
         self.current_gal_data = {}
-        self.poss_extvers = []
-        for g, p in product(
-            [
-                self.config["grisms"]["B"],
-                self.config["grisms"]["G"],
-                self.config["grisms"]["R"],
-            ],
-            [self.config["grisms"]["PA1"], self.config["grisms"]["PA2"]],
-        ):
-            self.poss_extvers.append(f"{g},{p}")
-            self.current_gal_data[f"{g},{p}"] = {}
+        self.filter_names, self.PAs = grism_names(self.config.get("grisms", {}))
+        self.poss_extvers = beam_names(self.filter_names[::-1], self.PAs)
+        for gp in self.poss_extvers:
+            self.current_gal_data[gp] = {}
 
         self.warning_flag = True
 
@@ -266,9 +297,9 @@ class GCG(ctk.CTk):
         )
         self.gal_info_label.insert(ctk.END, "")
 
-        self.rescan_and_reload()
+        self.rescan_and_reload(use_session=True)
 
-    def rescan_and_reload(self, skip=False):
+    def rescan_and_reload(self, skip=False, use_session=False):
         try:
             assert (
                 len(self.config["files"].get("extractions_dir", "")) > 0
@@ -278,38 +309,17 @@ class GCG(ctk.CTk):
                 fpe, root=self.config["files"].get("root_dir", None)
             )
 
-            try:
-                self.cat = QTable.read(
-                    fpe_with_root(
-                        self.config["files"]["cat_path"],
-                    )
-                )
-            except Exception as e:
-                print(f"Catalogue could not be loaded from `cat_path' in config: {e}")
-                try:
-                    self.cat = QTable.read(
-                        [
-                            *fpe_with_root(
-                                self.config["files"]["extractions_dir"]
-                            ).glob(
-                                "*ir.cat.fits",
-                            )
-                        ][0]
-                    )
-                except:
-                    self.cat = None
-
-            assert self.cat is not None, "No catalogue found."
-
-            self.filter_names = [
-                self.config.get("grisms", {}).get("R", "F200W"),
-                self.config.get("grisms", {}).get("G", "F150W"),
-                self.config.get("grisms", {}).get("B", "F115W"),
-            ]
-            self.PAs = [
-                str(self.config.get("grisms", {}).get("PA1", 72.0)),
-                str(self.config.get("grisms", {}).get("PA2", 341.0)),
-            ]
+            # Only the columns used are read, and cached in the temporary
+            # directory
+            read_cat = partial(
+                read_catalogue,
+                columns=catalogue_columns(self.config.get("catalogue", {})),
+                cache_dir=self.get_cache_dir(fpe_with_root),
+            )
+            self.filter_names, self.PAs = grism_names(self.config.get("grisms", {}))
+            self.poss_extvers = beam_names(self.filter_names[::-1], self.PAs)
+            # The columns required for a classification to be saved
+            self.out_colnames = self.new_output_table().colnames
 
             try:
                 assert len(self.config["files"].get("out_dir", "")) > 0
@@ -348,84 +358,125 @@ class GCG(ctk.CTk):
                 self.read_write_button.set("Read-only")
                 self.read_write_button.configure(state="disabled")
 
-            try:
-                self.out_cat = QTable.read(self.out_cat_path)
-            except:
-                self.out_cat = QTable(
-                    names=[
-                        "ID",
-                        "SEG_ID",
-                        "RA",
-                        "DEC",
-                        f"{self.filter_names[2]},{self.PAs[0]}_QUALITY",
-                        f"{self.filter_names[2]},{self.PAs[0]}_COVERAGE",
-                        f"{self.filter_names[1]},{self.PAs[0]}_QUALITY",
-                        f"{self.filter_names[1]},{self.PAs[0]}_COVERAGE",
-                        f"{self.filter_names[0]},{self.PAs[0]}_QUALITY",
-                        f"{self.filter_names[0]},{self.PAs[0]}_COVERAGE",
-                        f"{self.filter_names[2]},{self.PAs[1]}_QUALITY",
-                        f"{self.filter_names[2]},{self.PAs[1]}_COVERAGE",
-                        f"{self.filter_names[1]},{self.PAs[1]}_QUALITY",
-                        f"{self.filter_names[1]},{self.PAs[1]}_COVERAGE",
-                        f"{self.filter_names[0]},{self.PAs[1]}_QUALITY",
-                        f"{self.filter_names[0]},{self.PAs[1]}_COVERAGE",
-                        "GRIZLI_REDSHIFT",
-                        "ESTIMATED_REDSHIFT",
-                        "UNRELIABLE_REDSHIFT",
-                        "TENTATIVE_REDSHIFT",
-                        "BAD_SEG_MAP",
-                        "COMMENTS",
-                    ],
-                    dtype=[
-                        str,
-                        int,
-                        float,
-                        float,
-                        str,
-                        float,
-                        str,
-                        float,
-                        str,
-                        float,
-                        str,
-                        float,
-                        str,
-                        float,
-                        str,
-                        float,
-                        float,
-                        float,
-                        bool,
-                        bool,
-                        bool,
-                        str,
-                    ],
-                    units=[
-                        None,
-                        None,
-                        "deg",
-                        "deg",
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                        None,
-                    ],
+            self.extractions_dir = fpe_with_root(
+                self.config["files"]["extractions_dir"],
+            )
+            if self.config["files"].get("prep_dir", None) is not None:
+                self.prep_dir = fpe_with_root(
+                    self.config["files"]["prep_dir"],
+                )
+            else:
+                self.prep_dir = fpe_with_root(
+                    self.config["files"]["extractions_dir"],
                 )
 
+            pad = self.config.get("catalogue", {}).get("seg_id_length", 5)
+
+            scan_start = time.perf_counter()
+            if len(self.config["files"].get("manifest_path", "")) > 0:
+                self.product_index = ProductIndex.read_manifest(
+                    fpe_with_root(self.config["files"]["manifest_path"]),
+                    root=self.extractions_dir,
+                    pad=pad,
+                )
+                changed_dirs = set()
+            else:
+                # Reuse the previous scan where possible, so that only the
+                # directories modified since then are listed again
+                if not (
+                    hasattr(self, "product_index")
+                    and self.product_index.root == self.extractions_dir
+                    and self.product_index.pad == pad
+                    and len(self.product_index.dirs) > 0
+                ):
+                    try:
+                        self.product_index = ProductIndex.read(
+                            self.out_cat_path.with_suffix(".products.json")
+                        )
+                        assert self.product_index.root == self.extractions_dir
+                        assert self.product_index.pad == pad
+                    except:
+                        self.product_index = ProductIndex(self.extractions_dir, pad=pad)
+                changed_dirs = self.product_index.update(
+                    n_threads=self.config["files"].get("scan_threads", 8),
+                )
+            if len(changed_dirs) > 0 and hasattr(self, "out_cat_path"):
+                try:
+                    self.product_index.write(
+                        self.out_cat_path.with_suffix(".products.json")
+                    )
+                except Exception as e:
+                    print(f"Could not save the product index: {e}")
+
+            self.skip_existing = self.config["files"].get("skip_existing", True) or skip
+
+            # If nothing has changed since the last session, the catalogue
+            # and queue are restored from the snapshot. An explicit rescan
+            # always rebuilds them
+            session = None
+            if use_session and len(changed_dirs) == 0:
+                session = self.load_session()
+
+            # Any pending writes must finish before the catalogue is read
+            self.stop_writer()
+            self.close_database()
+            self.output_backend = self.config["files"].get("output_backend", "fits")
+            if self.output_backend == "sqlite" and hasattr(self, "out_cat_path"):
+                self.database = ClassificationDatabase(
+                    self.get_out_path(".sqlite"),
+                    self.new_output_table(),
+                    self.config["files"].get("annotator", "") or getpass.getuser(),
+                    journal_mode=self.config["files"].get(
+                        "sqlite_journal_mode", "delete"
+                    ),
+                )
+                self.out_cat = self.database.read()
+            else:
+                try:
+                    self.out_cat = migrate_output(
+                        QTable.read(self.out_cat_path), self.new_output_table()
+                    )
+                except:
+                    self.out_cat = self.new_output_table()
+
+            # Recover any classifications saved since the catalogue was
+            # last written
+            if hasattr(self, "out_cat_path") and self.database is None:
+                self.writer = CatalogueWriter(self.out_cat_path)
+                self.writer.start()
+                self.journal = ClassificationJournal(self.get_out_path(".journal"))
+                n_replayed = self.journal.replay(self.out_cat, encode=encode_record)
+                if n_replayed > 0:
+                    print(f"Recovered {n_replayed} classification(s) from the journal.")
+                    self.compact_output()
+            self.out_rows = index_rows(self.out_cat)
+
+            if session is not None:
+                self.cat = session[0]
+            else:
+                try:
+                    self.cat_path = fpe_with_root(
+                        self.config["files"]["cat_path"],
+                    )
+                    self.cat = read_cat(self.cat_path)
+                except Exception as e:
+                    print(
+                        f"Catalogue could not be loaded from `cat_path' in config: {e}"
+                    )
+                    try:
+                        self.cat_path = [
+                            *fpe_with_root(
+                                self.config["files"]["extractions_dir"]
+                            ).glob(
+                                "*ir.cat.fits",
+                            )
+                        ][0]
+                        self.cat = read_cat(self.cat_path)
+                    except:
+                        self.cat = None
+
+            assert self.cat is not None, "No catalogue found."
+
             for key, default in zip(
                 ["id", "ra", "dec"], ["NUMBER", "X_WORLD", "Y_WORLD"]
             ):
@@ -499,98 +550,92 @@ class GCG(ctk.CTk):
                 except Exception as e:
                     pass
 
-            # Segmentation map ids must be a unique identifier!
-            # If you're reading this comment, something has gone horribly wrong
-            _, unique_idx = np.unique(self.seg_id_col, return_index=True)
-            unique_idx = np.sort(unique_idx)
-            self.seg_id_col = self.seg_id_col[unique_idx]
-            self.id_col = self.id_col[unique_idx]
-            self.cat = self.cat[unique_idx]
-            self.extractions_dir = fpe_with_root(
-                self.config["files"]["extractions_dir"],
-            )
-            if self.config["files"].get("prep_dir", None) is not None:
-                self.prep_dir = fpe_with_root(
-                    self.config["files"]["prep_dir"],
+            # Objects are only added to the queue once they have both a
+            # stack and a 1D spectrum
+            self.complete_keys = self.product_index.seg_ids(
+                "stack", "spec2D"
+            ) & self.product_index.seg_ids("1D", "spec1D", "1D_RC")
+            self.search_active = False
+
+            if session is None:
+                # Segmentation map ids must be a unique identifier!
+                # If you're reading this comment, something has gone horribly wrong
+                _, unique_idx = np.unique(self.seg_id_col, return_index=True)
+                unique_idx = np.sort(unique_idx)
+                self.seg_id_col = self.seg_id_col[unique_idx]
+                self.id_col = self.id_col[unique_idx]
+                self.cat = self.cat[unique_idx]
+                self.full_cat = self.cat
+                self.full_id_col = self.id_col
+                self.full_seg_id_col = self.seg_id_col
+                self.add_pixel_coords()
+                id_idx_list = np.flatnonzero(
+                    np.isin(
+                        np.char.rjust(self.seg_id_col.astype(str), pad, "0"),
+                        np.array([*self.complete_keys], dtype=str),
+                    )
                 )
-            else:
-                self.prep_dir = fpe_with_root(
-                    self.config["files"]["extractions_dir"],
+                print(
+                    f"Found {len(id_idx_list)}/{len(self.seg_id_col)} catalogue objects "
+                    f"in {time.perf_counter() - scan_start:.2f}s "
+                    f"({len(changed_dirs)}/{len(self.product_index.dirs)} "
+                    "directories rescanned)."
                 )
 
-            id_idx_list = []
-
-            pad = self.config.get("catalogue", {}).get("seg_id_length", 5)
+                self.orig_total = len(id_idx_list)
+                if self.skip_existing:
+                    id_idx_list = id_idx_list[
+                        ~np.isin(self.seg_id_col[id_idx_list], self.out_cat["SEG_ID"])
+                    ]
 
-            stack_ids = [
-                s.stem[-6 - pad : -6]
-                for s in self.extractions_dir.glob("**/*.stack.fits")
-            ] + [
-                s.stem[-7 - pad : -7]
-                for s in self.extractions_dir.glob("**/*.spec2D.fits")
-            ]
-            oned_ids = (
-                [
-                    s.stem[-3 - pad : -3]
-                    for s in self.extractions_dir.glob("**/*.1D.fits")
-                ]
-                + [
-                    s.stem[-7 - pad : -7]
-                    for s in self.extractions_dir.glob("**/*.spec1D.fits")
-                ]
-                + [
-                    s.stem[-6 - pad : -6]
-                    for s in self.extractions_dir.glob("**/*.1D_RC.fits")
-                ]
-            )
+                assert len(id_idx_list) > 0, (
+                    f"No matches found in the extractions directory for the "
+                    f"{len(self.id_col)} objects in the catalogue."
+                )
 
-            for i, (n, s) in tqdm(
-                enumerate(zip(self.id_col, self.seg_id_col)),
-                desc="Scanning directory for objects in catalogue",
-                total=len(self.id_col),
-            ):
-                if f"{s:0>{pad}}" in oned_ids and f"{s:0>{pad}}" in stack_ids:
-                    id_idx_list.append(i)
-
-            self.orig_total = len(id_idx_list)
-            if self.config["files"].get("skip_existing", True) or skip:
-                id_idx_list = [
-                    i
-                    for i in id_idx_list
-                    if self.seg_id_col[i] not in self.out_cat["SEG_ID"]
-                ]
-
-            assert len(id_idx_list) > 0, (
-                f"No matches found in the extractions directory for the "
-                f"{len(self.id_col)} objects in the catalogue."
-            )
+                self.queue_idx = id_idx_list
+                self.id_col = self.id_col[id_idx_list]
+                self.seg_id_col = self.seg_id_col[id_idx_list]
+                self.cat = self.cat[id_idx_list]
+
+                self.load_grizli_summary()
+                self.sort_queue()
+                if len(self.id_col) == 0:
+                    raise ValueError(
+                        f"None of the {len(id_idx_list)} objects found have a line "
+                        "with S/N above `min_line_sn' "
+                        f"({self.config['catalogue']['min_line_sn']})."
+                    )
+            else:
+                cursor = self.restore_session(session)
+                if len(self.id_col) == 0:
+                    # Every object in the restored queue has since been
+                    # classified, so the queue is rebuilt from the catalogue
+                    print(
+                        "No unclassified objects remain in the queue restored "
+                        "from the previous session. Rebuilding the queue."
+                    )
+                    return self.rescan_and_reload(skip=skip, use_session=False)
+            self.sky_coords = self.get_sky_coords(self.cat)
 
-            self.id_col = self.id_col[id_idx_list]
-            self.seg_id_col = self.seg_id_col[id_idx_list]
-            self.cat = self.cat[id_idx_list]
-            try:
-                self.sky_coords = SkyCoord(
-                    self.cat[self.config.get("catalogue", {}).get("ra", "X_WORLD")],
-                    self.cat[self.config.get("catalogue", {}).get("dec", "Y_WORLD")],
-                )
-            except:
-                self.sky_coords = SkyCoord(
-                    self.cat[self.config.get("catalogue", {}).get("ra", "X_WORLD")],
-                    self.cat[self.config.get("catalogue", {}).get("dec", "Y_WORLD")],
-                    unit="deg",
-                )
+            self.queue = ObjectQueue(self.id_col, self.seg_id_col)
+            if session is not None:
+                # Reopen on the last object viewed
+                self.queue.move_to(cursor)
 
-            assert len(self.id_col) > 0
+            self.load_stack_headers()
 
-            self.current_gal_id.set(self.id_col[0])
-            self.tab_row = self.cat[0]
-            self.seg_id = self.seg_id_col[0]
+            self.current_gal_id.set(self.id_col[self.queue.cursor])
+            self.tab_row = self.cat[self.queue.cursor]
+            self.seg_id = self.seg_id_col[self.queue.cursor]
             if hasattr(self, "current_seg_id"):
                 self.current_seg_id.set(self.seg_id)
 
             self.set_current_data()
 
             self.generate_tabs()
+
+            self.start_watching()
         except Exception as e:
             error = CTkMessagebox(
                 title="Error",
@@ -601,6 +646,344 @@ class GCG(ctk.CTk):
             if error.get() == "OK":
                 self.generate_splash()
 
+    def get_cache_dir(self, fpe_with_root):
+        if len(self.config["files"].get("temp_dir", "")) > 0:
+            return fpe_with_root(self.config["files"]["temp_dir"])
+        elif len(self.config["files"].get("out_dir", "")) > 0:
+            return fpe_with_root(self.config["files"]["out_dir"]) / ".temp"
+        else:
+            return None
+
+    def new_output_table(self):
+        # One quality and coverage column for each beam, ordered by
+        # orientation and then wavelength
+        return output_table(beam_names(self.filter_names[::-1], self.PAs))
+
+    def close_database(self):
+        if getattr(self, "database", None) is not None:
+            self.database.close()
+        self.database = None
+
+    def get_out_path(self, suffix):
+        # Files stored alongside the output catalogue, if there is one
+        if hasattr(self, "out_cat_path"):
+            return self.out_cat_path.with_suffix(suffix)
+        else:
+            return None
+
+    def load_session(self):
+        session_path = self.get_out_path(".session.fits")
+        if session_path is None:
+            return None
+        session = read_session(session_path, config_signature(self.config))
+        if session is None or session[2].get("skip_existing") != self.skip_existing:
+            return None
+        return session
+
+    def restore_session(self, session):
+        restore_start = time.perf_counter()
+        _, queue_idx, meta = session
+        self.full_cat = self.cat
+        self.full_id_col = self.id_col
+        self.full_seg_id_col = self.seg_id_col
+        self.orig_total = meta["orig_total"]
+        self.cat_path = Path(meta["cat_path"])
+        if meta.get("pixel_coords_path") is not None:
+            self.pixel_coords_path = Path(meta["pixel_coords_path"])
+        self.add_pixel_coords()
+        cursor = meta.get("cursor", 0)
+        if self.skip_existing:
+            # Objects classified since the snapshot was saved are removed,
+            # keeping the cursor on the same object where possible
+            keep = ~np.isin(
+                self.full_seg_id_col[queue_idx], np.array([*self.out_rows], dtype=int)
+            )
+            cursor = int(np.count_nonzero(keep[:cursor]))
+            queue_idx = queue_idx[keep]
+        self.queue_idx = queue_idx
+        self.id_col = self.full_id_col[queue_idx]
+        self.seg_id_col = self.full_seg_id_col[queue_idx]
+        self.cat = self.full_cat[queue_idx]
+        # A queue of search results is not extended by the watcher
+        self.search_active = bool(meta.get("search_active", False))
+        # The queue has already been sorted, so the grizli output can be read
+        # in the background
+        self.load_grizli_summary(background=True)
+        print(
+            f"Restored the previous session ({len(queue_idx)} objects in the queue) "
+            f"in {time.perf_counter() - restore_start:.2f}s."
+        )
+        return cursor
+
+    def add_pixel_coords(self, pattern="*seg.fits"):
+        # The positions of all objects in the segmentation map are found at
+        # once, and stored in the full catalogue before the queue is selected
+        seg_paths = sorted([str(s) for s in self.prep_dir.glob(pattern)], key=len)
+        if len(seg_paths) == 0:
+            self.pixel_coords_path = None
+            return
+        seg_path = Path(seg_paths[0])
+        if (
+            getattr(self, "pixel_coords_path", None) == seg_path
+            and "SEG_X" in self.full_cat.colnames
+        ):
+            return
+        try:
+            with pf.open(seg_path) as hdul:
+                seg_wcs = WCS(hdul[0].header)
+            pix_x, pix_y = pixel_coordinates(
+                self.full_cat,
+                seg_wcs,
+                key_ra=self.config.get("catalogue", {}).get("ra", "X_WORLD"),
+                key_dec=self.config.get("catalogue", {}).get("dec", "Y_WORLD"),
+            )
+            self.full_cat["SEG_X"] = pix_x.value
+            self.full_cat["SEG_Y"] = pix_y.value
+            self.pixel_coords_path = seg_path
+        except Exception as e:
+            print(f"Could not find the pixel coordinates of the catalogue: {e}")
+            self.pixel_coords_path = None
+
+    def session_sources(self):
+        # The files which the queue depends on
+        sources = [
+            getattr(self, "cat_path", None),
+            getattr(self, "pixel_coords_path", None),
+            self.get_out_path(".journal"),
+            self.get_out_path(".sqlite"),
+            self.get_out_path(".sqlite-wal"),
+        ]
+        if hasattr(self, "out_cat_path"):
+            sources.append(self.out_cat_path)
+        if len(self.config["files"].get("manifest_path", "")) > 0:
+            sources.append(
+                fpe(
+                    self.config["files"]["manifest_path"],
+                    root=self.config["files"].get("root_dir", None),
+                )
+            )
+        return sources
+
+    def save_session(self):
+        session_path = self.get_out_path(".session.fits")
+        if session_path is None or not hasattr(self, "queue_idx"):
+            return
+        pixel_coords_path = getattr(self, "pixel_coords_path", None)
+        try:
+            write_session(
+                session_path,
+                self.full_cat,
+                self.queue_idx,
+                {
+                    "signature": config_signature(self.config),
+                    "stamps": file_stamps(self.session_sources()),
+                    "cursor": self.queue.cursor,
+                    "orig_total": int(self.orig_total),
+                    "cat_path": str(self.cat_path),
+                    "skip_existing": bool(self.skip_existing),
+                    "search_active": bool(getattr(self, "search_active", False)),
+                    "pixel_coords_path": (
+                        None if pixel_coords_path is None else str(pixel_coords_path)
+                    ),
+                },
+            )
+        except Exception as e:
+            print(f"Could not save the session: {e}")
+
+    def load_grizli_summary(self, background=False):
+        cache_path = self.get_out_path(".grizli.json")
+        if (
+            not hasattr(self, "grizli_summary")
+            or self.grizli_summary.cache_path != cache_path
+        ):
+            self.grizli_summary = GrizliSummary(self.product_index, cache_path)
+        self.grizli_summary.product_index = self.product_index
+
+        n_threads = self.config["files"].get("scan_threads", 8)
+        cat_config = self.config.get("catalogue", {})
+        if not background and (
+            len(cat_config.get("sort_by", "")) > 0 or "min_line_sn" in cat_config
+        ):
+            # The whole field is needed to sort or filter the queue
+            summary_start = time.perf_counter()
+            self.grizli_summary.prefetch(self.seg_id_col, n_threads=n_threads)
+            print(
+                f"Read the grizli output for {len(self.seg_id_col)} objects in "
+                f"{time.perf_counter() - summary_start:.2f}s."
+            )
+        else:
+            self.summary_thread = threading.Thread(
+                target=self.grizli_summary.prefetch,
+                args=(self.seg_id_col,),
+                kwargs={"n_threads": n_threads},
+                daemon=True,
+            )
+            self.summary_thread.start()
+
+    def sort_queue(self):
+        cat_config = self.config.get("catalogue", {})
+        sort_by = cat_config.get("sort_by", "")
+        if len(sort_by) == 0 and "min_line_sn" not in cat_config:
+            return
+
+        summary_tab = self.grizli_summary.to_table(self.seg_id_col)
+        queue_idx = np.arange(len(summary_tab))
+        if "min_line_sn" in cat_config:
+            queue_idx = queue_idx[
+                np.nan_to_num(summary_tab["MAX_SN"], nan=-np.inf)
+                >= float(cat_config["min_line_sn"])
+            ]
+        if len(sort_by) > 0:
+            sort_col = np.asarray(summary_tab[sort_by.lstrip("-").upper()])[queue_idx]
+            if sort_by.startswith("-") and sort_col.dtype.kind in "iuf":
+                # Negating keeps NaN values at the end of the queue
+                order = np.argsort(-sort_col, kind="stable")
+            elif sort_by.startswith("-"):
+                order = np.argsort(sort_col, kind="stable")[::-1]
+            else:
+                order = np.argsort(sort_col, kind="stable")
+            queue_idx = queue_idx[order]
+
+        self.queue_idx = self.queue_idx[queue_idx]
+        self.id_col = self.id_col[queue_idx]
+        self.seg_id_col = self.seg_id_col[queue_idx]
+        self.cat = self.cat[queue_idx]
+
+    def load_stack_headers(self):
+        # The location and headers of each HDU are indexed in the background,
+        # so that later objects can be displayed by seeking directly to the
+        # extensions they need
+        offsets_path = self.get_out_path(".offsets.json")
+        if (
+            not hasattr(self, "hdu_offsets")
+            or self.hdu_offsets.cache_path != offsets_path
+        ):
+            self.hdu_offsets = HDUOffsetIndex(offsets_path)
+        self.header_thread = threading.Thread(
+            target=self.hdu_offsets.prefetch,
+            args=(
+                [
+                    self.product_index.first(s, "stack", "spec2D")
+                    for s in self.seg_id_col
+                ],
+            ),
+            kwargs={"n_threads": self.config["files"].get("scan_threads", 8)},
+            daemon=True,
+        )
+        self.header_thread.start()
+
+    def get_stack_product(self, file_path):
+        # Both orientation tabs draw from the same file, which is only read
+        # once per object
+        if (
+            getattr(self, "stack_product", None) is None
+            or self.stack_product.path != file_path
+        ):
+            if getattr(self, "stack_product", None) is not None:
+                self.stack_product.close()
+            self.stack_product = StackProduct(file_path, offsets=self.hdu_offsets)
+        return self.stack_product
+
+    def get_sky_coords(self, cat):
+        try:
+            return SkyCoord(
+                cat[self.config.get("catalogue", {}).get("ra", "X_WORLD")],
+                cat[self.config.get("catalogue", {}).get("dec", "Y_WORLD")],
+            )
+        except:
+            return SkyCoord(
+                cat[self.config.get("catalogue", {}).get("ra", "X_WORLD")],
+                cat[self.config.get("catalogue", {}).get("dec", "Y_WORLD")],
+                unit="deg",
+            )
+
+    def start_watching(self):
+        self.stop_watching()
+        interval = float(self.config["files"].get("watch_interval", 0))
+        if interval <= 0:
+            return
+        self.watcher = ProductWatcher(
+            self.product_index,
+            interval=interval,
+            n_threads=self.config["files"].get("scan_threads", 8),
+        )
+        self.watcher.start()
+        self.watch_job = self.after(1000, self.poll_watcher)
+
+    def stop_watching(self):
+        if getattr(self, "watcher", None) is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if getattr(self, "watch_job", None) is not None:
+            self.after_cancel(self.watch_job)
+            self.watch_job = None
+
+    def poll_watcher(self):
+        # Tkinter is not thread-safe, so the watcher results are merged here
+        touched = set()
+        while True:
+            try:
+                new_dirs, changed = self.watcher.updates.get_nowait()
+            except queue.Empty:
+                break
+            touched |= self.product_index.merge(new_dirs, changed)
+        if len(touched) > 0:
+            self.add_new_objects(touched)
+        self.watch_job = self.after(1000, self.poll_watcher)
+
+    def add_new_objects(self, seg_keys):
+        complete = {
+            s
+            for s in seg_keys
+            if self.product_index.has(s, "stack", "spec2D")
+            and self.product_index.has(s, "1D", "spec1D", "1D_RC")
+        }
+        # Only objects completed since the last poll are new, so that any
+        # removed by filtering or searching are not added again
+        newly_complete = complete - self.complete_keys
+        self.complete_keys = (self.complete_keys - set(seg_keys)) | complete
+        if self.search_active:
+            return
+
+        new_seg_ids = []
+        for s in newly_complete:
+            try:
+                new_seg_ids.append(int(s))
+            except ValueError:
+                pass
+
+        new_idx = np.flatnonzero(
+            np.isin(self.full_seg_id_col, new_seg_ids)
+            & ~np.isin(self.full_seg_id_col, self.seg_id_col)
+        )
+        if self.skip_existing:
+            new_idx = new_idx[
+                ~np.isin(self.full_seg_id_col[new_idx], self.out_cat["SEG_ID"])
+            ]
+        cat_config = self.config.get("catalogue", {})
+        if len(new_idx) > 0 and "min_line_sn" in cat_config:
+            self.grizli_summary.prefetch(self.full_seg_id_col[new_idx])
+            summary_tab = self.grizli_summary.to_table(self.full_seg_id_col[new_idx])
+            new_idx = new_idx[
+                np.nan_to_num(summary_tab["MAX_SN"], nan=-np.inf)
+                >= float(cat_config["min_line_sn"])
+            ]
+        if len(new_idx) == 0:
+            return
+
+        self.queue_idx = np.concatenate([self.queue_idx, new_idx])
+        self.id_col = np.concatenate([self.id_col, self.full_id_col[new_idx]])
+        self.seg_id_col = np.concatenate(
+            [self.seg_id_col, self.full_seg_id_col[new_idx]]
+        )
+        self.cat = vstack([self.cat, self.full_cat[new_idx]])
+        self.queue.extend(self.full_id_col[new_idx], self.full_seg_id_col[new_idx])
+        self.sky_coords = concatenate(
+            [self.sky_coords, self.get_sky_coords(self.full_cat[new_idx])]
+        )
+        self.orig_total += len(new_idx)
+        print(f"Added {len(new_idx)} new object(s) to the end of the queue.")
+
     def generate_splash(self):
         self.splash_frame = ctk.CTkFrame(self)
         self.splash_frame.grid(row=0, column=0, rowspan=2, sticky="news")
@@ -625,13 +1008,12 @@ class GCG(ctk.CTk):
             "cmap": "plasma",
             "stretch": "Square root",
             "limits": "grizli default",
+            "render": self.config["appearance"].get("beam_render", "axes").capitalize(),
         }
 
         self.tab_names = [
-            f"Orientation 1: {self.PAs[0]} deg",
-            f"Orientation 2: {self.PAs[1]} deg",
-            f"Spectrum",
-        ]
+            f"Orientation {i + 1}: {p} deg" for i, p in enumerate(self.PAs)
+        ] + ["Spectrum"]
         self.object_progress = {}
         for n in self.tab_names:
             self.object_progress[n] = False
@@ -646,26 +1028,26 @@ class GCG(ctk.CTk):
         self.main_tabs._segmented_button.grid(sticky="ew")
 
         self.full_spec_frame = SpecFrame(
-            self.main_tabs.tab(self.tab_names[2]), self.current_gal_id.get()
+            self.main_tabs.tab(self.tab_names[-1]), self.current_gal_id.get()
         )
         self.full_spec_frame.pack(fill="both", expand=1)
 
-        self.beam_frame_1 = BeamFrame(
-            self.main_tabs.tab(self.tab_names[0]),
-            self.current_gal_id.get(),
-            self.PAs[0],
-        )
-        self.beam_frame_1.pack(fill="both", expand=1)
-        self.beam_frame_2 = BeamFrame(
-            self.main_tabs.tab(self.tab_names[1]),
-            self.current_gal_id.get(),
-            self.PAs[1],
-        )
-        self.beam_frame_2.pack(fill="both", expand=1)
+        # One tab for each orientation
+        self.beam_frames = []
+        for n, p in zip(self.tab_names[:-1], self.PAs):
+            beam_frame = BeamFrame(
+                self.main_tabs.tab(n),
+                self.current_gal_id.get(),
+                p,
+            )
+            beam_frame.pack(fill="both", expand=1)
+            self.beam_frames.append(beam_frame)
 
+        # One row of keys for each filter, in the order shown. Any filters
+        # beyond the third have no keyboard shortcuts
         self.quality_key_map = np.array(
             [["q", "w", "e", "r"], ["u", "i", "o", "p"], ["a", "s", "d", "f"]]
-        )
+        )[: len(self.filter_names)]
         for l in self.quality_key_map.flatten():
             self.bind(f"{l}", self.select_quality_menu)
 
@@ -678,7 +1060,7 @@ class GCG(ctk.CTk):
         if event != None and event.widget.winfo_class() == ("Entry" or "Textbox"):
             return
 
-        for widg in [self.beam_frame_1, self.beam_frame_2]:
+        for widg in self.beam_frames:
             for row in self.quality_key_map:
                 widg.beam_single_PA_frame.quality_frame.keypress_select(
                     row[-1], self.quality_key_map
@@ -688,13 +1070,11 @@ class GCG(ctk.CTk):
         if event != None and event.widget.winfo_class() == ("Entry" or "Textbox"):
             return
 
-        if self.beam_frame_1.winfo_viewable():
-            widg = self.beam_frame_1
-        else:
-            widg = self.beam_frame_2
-        widg.beam_single_PA_frame.quality_frame.keypress_select(
-            event.char, self.quality_key_map
-        )
+        for widg in self.beam_frames:
+            if widg.winfo_viewable():
+                widg.beam_single_PA_frame.quality_frame.keypress_select(
+                    event.char, self.quality_key_map
+                )
 
     def initialise_configuration(self, config_file=None):
         try:
@@ -790,6 +1170,15 @@ class GCG(ctk.CTk):
                 " the desired theme."
             )
 
+        try:
+            appearance["beam_render"]
+        except:
+            appearance.add("beam_render", "axes")
+            appearance["beam_render"].comment(
+                "Axes (default) or mosaic. The mosaic draws the beam panels as a "
+                "single image, which is faster to redraw."
+            )
+
         # Lines
         try:
             lines = self.config["lines"]
@@ -854,8 +1243,9 @@ class GCG(ctk.CTk):
 
     def update_progress(self):
         num = np.sum([*self.object_progress.values()])
-        blocks = num * 4 * "\u2588"
-        self.progress_status.configure(text=f"|{blocks:\u2591<12}| {num}/3")
+        n_tabs = max(len(self.object_progress), 1)
+        blocks = (12 * num // n_tabs) * "\u2588"
+        self.progress_status.configure(text=f"|{blocks:\u2591<12}| {num}/{n_tabs}")
 
     def open_settings_callback(self, event=None):
         if self.settings_window is None or not self.settings_window.winfo_exists():
@@ -881,20 +1271,14 @@ class GCG(ctk.CTk):
 
         if event != None and event.widget.winfo_class() == ("Entry" or "Textbox"):
             return
-        current_tab = self.main_tabs.get()
-        if current_tab == self.tab_names[2]:
-            self.main_tabs.set(self.tab_names[1])
+        tab_idx = self.tab_names.index(self.main_tabs.get())
+        if tab_idx > 0:
+            self.main_tabs.set(self.tab_names[tab_idx - 1])
             self.main_tabs_update()
-        elif current_tab == self.tab_names[1]:
-            self.main_tabs.set(self.tab_names[0])
-            self.main_tabs_update()
-        elif current_tab == self.tab_names[0]:
+        else:
             self.save_current_object()
-            current_gal_idx = (self.id_col == self.current_gal_id.get()).nonzero()[0]
-            self.current_gal_id.set(
-                self.id_col[(current_gal_idx - 1) % len(self.id_col)][0]
-            )
-            self.main_tabs.set(self.tab_names[2])
+            self.current_gal_id.set(self.id_col[self.queue.step(-1)])
+            self.main_tabs.set(self.tab_names[-1])
             self.change_gal_id()
         self.object_progress[self.main_tabs.get()] = True
         self.update_progress()
@@ -909,16 +1293,13 @@ class GCG(ctk.CTk):
 
         if event != None and event.widget.winfo_class() == ("Entry" or "Textbox"):
             return
-        current_tab = self.main_tabs.get()
-        if current_tab == self.tab_names[0]:
-            self.main_tabs.set(self.tab_names[1])
+        tab_idx = self.tab_names.index(self.main_tabs.get())
+        if tab_idx < len(self.tab_names) - 1:
+            self.main_tabs.set(self.tab_names[tab_idx + 1])
             self.main_tabs_update()
-        elif current_tab == self.tab_names[1]:
-            self.main_tabs.set(self.tab_names[2])
-            self.main_tabs_update()
-        elif current_tab == self.tab_names[2]:
+        else:
             self.save_current_object()
-            if self.current_gal_id.get() == self.id_col[-1]:
+            if self.queue.at_end:
                 match self.check_end_objects():
                     case "continue":
                         pass
@@ -929,10 +1310,7 @@ class GCG(ctk.CTk):
                         return
                     case "quit":
                         self.quit_gracefully()
-            current_gal_idx = (self.id_col == self.current_gal_id.get()).nonzero()[0]
-            self.current_gal_id.set(
-                self.id_col[(current_gal_idx + 1) % len(self.id_col)][0]
-            )
+            self.current_gal_id.set(self.id_col[self.queue.step(1)])
             self.main_tabs.set(self.tab_names[0])
             self.change_gal_id()
         self.object_progress[self.main_tabs.get()] = True
@@ -964,8 +1342,8 @@ class GCG(ctk.CTk):
             return
 
     def check_end_objects(self):
-        num_classified = len(
-            [a for a in self.seg_id_col if a in self.out_cat["SEG_ID"].value]
+        num_classified = np.count_nonzero(
+            np.isin(self.seg_id_col, self.out_cat["SEG_ID"])
         )
 
         if num_classified < len(self.seg_id_col):
@@ -1010,13 +1388,13 @@ class GCG(ctk.CTk):
         return out
 
     def save_button_fn(self, event=None):
-        flattened_data = flatten_dict(self.current_gal_data)
+        flattened_data = encode_record(flatten_dict(self.current_gal_data))
 
         if self.read_write_button.get().lower() != "write output":
             self.raise_save_warning("This program is currently set to `Read-only`.")
-        elif np.sum([*self.object_progress.values()]) < 3:
+        elif np.sum([*self.object_progress.values()]) < len(self.tab_names):
             self.raise_save_warning("Not all tabs have been viewed yet.")
-        elif len(flattened_data) < 22:
+        elif not all(k in flattened_data for k in self.out_colnames):
             self.raise_save_warning(
                 "This is a catch-all error. Somehow the output row "
                 "is insufficiently populated."
@@ -1027,14 +1405,14 @@ class GCG(ctk.CTk):
 
     def save_current_object(self, event=None):
         ### This is where the logic for loading/updating the tables will go
-        flattened_data = flatten_dict(self.current_gal_data)
+        flattened_data = encode_record(flatten_dict(self.current_gal_data))
 
         if (
-            len(flattened_data) == 22
+            all(k in flattened_data for k in self.out_colnames)
             and self.read_write_button.get() == "Write output"
-            and np.sum([*self.object_progress.values()]) == 3
+            and np.sum([*self.object_progress.values()]) == len(self.tab_names)
         ):
-            if flattened_data["SEG_ID"] in self.out_cat["SEG_ID"]:
+            if flattened_data["SEG_ID"] in self.out_rows:
                 warn_overwrite = CTkMessagebox(
                     title="Object already classified!",
                     message=(
@@ -1051,20 +1429,81 @@ class GCG(ctk.CTk):
                     self.focus_force()
                     return
                 else:
-                    self.out_cat.remove_rows(
-                        (flattened_data["SEG_ID"] == self.out_cat["SEG_ID"]).nonzero()[
-                            0
-                        ]
-                    )
                     self.focus_force()
-            self.out_cat.add_row(flattened_data)
-            self.out_cat.write(self.out_cat_path, overwrite=True)
+            # Existing rows are overwritten in place
+            update_record(self.out_cat, self.out_rows, flattened_data)
+            if self.database is not None:
+                try:
+                    self.database.upsert(flattened_data)
+                except Exception as e:
+                    self.raise_save_warning(f"Could not save classification: {e}")
+                    return
+            else:
+                # Each save is appended to the journal, and the full catalogue
+                # is only rewritten periodically
+                try:
+                    self.journal.append(flattened_data)
+                except Exception as e:
+                    self.raise_save_warning(f"Could not save classification: {e}")
+                    return
+                if self.journal.n_records >= self.config["files"].get(
+                    "compact_interval", 50
+                ):
+                    self.compact_output()
 
             print(
                 f"{len(self.out_cat) / self.orig_total:.1%} : "
                 f"{len(self.out_cat)} / {self.orig_total} objects classified"
             )
 
+    def compact_output(self):
+        if (
+            getattr(self, "writer", None) is None
+            or not hasattr(self, "journal")
+            or self.journal.n_records == 0
+        ):
+            return
+        # The catalogue is written in the background, and the journal is only
+        # truncated up to this point once the write has succeeded
+        self.last_write = self.journal.size()
+        self.writer.submit(self.out_cat, self.last_write)
+        self.journal.n_records = 0
+        if getattr(self, "writer_job", None) is None:
+            self.writer_job = self.after(250, self.poll_writer)
+
+    def poll_writer(self):
+        self.writer_job = None
+        if getattr(self, "writer", None) is None:
+            return
+        finished = False
+        while True:
+            try:
+                status, offset, e = self.writer.results.get_nowait()
+            except queue.Empty:
+                break
+            finished = offset == self.last_write
+            if status == "written":
+                try:
+                    self.journal.truncate(offset)
+                except Exception as e:
+                    print(f"Could not truncate the journal: {e}")
+            else:
+                self.raise_save_warning(f"Could not write the output catalogue: {e}")
+        if not finished:
+            self.writer_job = self.after(250, self.poll_writer)
+
+    def stop_writer(self):
+        if getattr(self, "writer", None) is None:
+            return
+        self.writer.stop()
+        if getattr(self, "writer_job", None) is not None:
+            self.after_cancel(self.writer_job)
+        self.poll_writer()
+        if getattr(self, "writer_job", None) is not None:
+            self.after_cancel(self.writer_job)
+            self.writer_job = None
+        self.writer = None
+
     def raise_save_warning(self, err_msg=""):
         warn_box = CTkMessagebox(
             title="Cannot Save Output",
@@ -1080,8 +1519,9 @@ class GCG(ctk.CTk):
         for n in self.tab_names:
             self.object_progress[n] = False
         self.update_progress()
-        self.tab_row = self.cat[self.id_col == self.current_gal_id.get()][0]
-        self.seg_id = self.seg_id_col[self.id_col == self.current_gal_id.get()][0]
+        # The cursor has already been moved to the new object
+        self.tab_row = self.cat[self.queue.cursor]
+        self.seg_id = self.seg_id_col[self.queue.cursor]
         if hasattr(self, "current_seg_id"):
             self.current_seg_id.set(self.seg_id)
 
@@ -1103,9 +1543,7 @@ class GCG(ctk.CTk):
         self.current_gal_data["comments"] = ""
 
         self.current_gal_coords.set(
-            self.sky_coords[self.seg_id_col == self.seg_id].to_string(
-                "decimal", precision=6
-            )[0]
+            self.sky_coords[self.queue.cursor].to_string("decimal", precision=6)
         )
 
         try:
@@ -1136,23 +1574,20 @@ class GCG(ctk.CTk):
             self.gal_info_label.insert(ctk.END, f' = {rad_val:.2f}"')
         self.gal_info_label.configure(state="disabled")
 
-        if self.seg_id in self.out_cat["SEG_ID"]:
-            out_row = self.out_cat[self.out_cat["SEG_ID"] == self.seg_id][0]
+        if self.seg_id in self.out_rows:
+            out_row = self.out_cat[self.out_rows[self.seg_id]]
             if not hasattr(out_row["COMMENTS"], "mask"):
                 self.current_gal_data["comments"] = out_row["COMMENTS"]
 
             for g in self.filter_names:
                 for p in self.PAs:
                     self.current_gal_data[f"{g},{p}"] = {
-                        "quality": out_row[f"{g},{p}_QUALITY"]
+                        "quality": decode_quality(out_row[f"{g},{p}_QUALITY"])
                     }
             self.current_gal_data["grizli_redshift"] = out_row["GRIZLI_REDSHIFT"]
             self.current_gal_data["estimated_redshift"] = out_row["ESTIMATED_REDSHIFT"]
-            self.current_gal_data["unreliable_redshift"] = out_row[
-                "UNRELIABLE_REDSHIFT"
-            ]
-            self.current_gal_data["tentative_redshift"] = out_row["TENTATIVE_REDSHIFT"]
-            self.current_gal_data["bad_seg_map"] = out_row["BAD_SEG_MAP"]
+            for k, v in unpack_flags(out_row["FLAGS"]).items():
+                self.current_gal_data[k.lower()] = v
 
         for gp in self.poss_extvers:
             self.current_gal_data[gp] = {}
@@ -1193,7 +1628,9 @@ class GCG(ctk.CTk):
             f"on-sky distance {dist[0].to(u.arcsec)}."
         )
 
-        self.current_gal_id.set(self.id_col[sky_match_idx])
+        self.current_gal_id.set(
+            self.id_col[self.queue.move_to(np.ravel(sky_match_idx)[0])]
+        )
 
         self.focus_force()
         self.save_current_object()
@@ -1203,7 +1640,9 @@ class GCG(ctk.CTk):
         self.save_current_object()
 
         try:
-            new_id = self.id_col[self.id_col == self.current_gal_entry.get()][0]
+            new_id = self.id_col[
+                self.queue.move_to(self.queue.find_id(self.current_gal_entry.get()))
+            ]
             self.current_gal_id.set(new_id)
             self.change_gal_id()
         except:
@@ -1214,8 +1653,7 @@ class GCG(ctk.CTk):
                 option_focus=1,
             )
             if error.get() == "OK":
-                self.id_col[self.seg_id_col == self.seg_id][0]
-                self.current_gal_id.set(self.id_col[self.seg_id_col == self.seg_id][0])
+                self.current_gal_id.set(self.id_col[self.queue.cursor])
                 self.focus_force()
                 return
 
@@ -1223,8 +1661,10 @@ class GCG(ctk.CTk):
         self.save_current_object()
 
         try:
-            new_id = self.id_col[self.seg_id_col == int(self.current_seg_entry.get())][
-                0
+            new_id = self.id_col[
+                self.queue.move_to(
+                    self.queue.find_seg_id(int(self.current_seg_entry.get()))
+                )
             ]
             self.current_gal_id.set(new_id)
             self.change_gal_id()
@@ -1261,15 +1701,30 @@ class GCG(ctk.CTk):
     def main_tabs_update(self):
         self.object_progress[self.main_tabs.get()] = True
         self.update_progress()
-        if self.main_tabs.get() == self.tab_names[2]:
+        if self.main_tabs.get() == self.tab_names[-1]:
             self.full_spec_frame.update_plot()
-        if self.main_tabs.get() == self.tab_names[0]:
-            self.beam_frame_1.update_grid()
-        if self.main_tabs.get() == self.tab_names[1]:
-            self.beam_frame_2.update_grid()
+        for n, widg in zip(self.tab_names, self.beam_frames):
+            if self.main_tabs.get() == n:
+                widg.update_grid()
 
     def quit_gracefully(self, event=None):
+        self.stop_watching()
+        if hasattr(self, "product_index") and hasattr(self, "out_cat_path"):
+            try:
+                self.product_index.write(
+                    self.out_cat_path.with_suffix(".products.json")
+                )
+            except Exception as e:
+                print(f"Could not save the product index: {e}")
+        self.compact_output()
+        self.stop_writer()
+        self.close_database()
+        if hasattr(self, "hdu_offsets"):
+            self.hdu_offsets.write()
+        if hasattr(self, "grizli_summary"):
+            self.grizli_summary.write()
         self.write_config()
+        self.save_session()
         self.quit()
 
 
@@ -1290,3 +1745,164 @@ def run_app(**kwargs):
     app = GCG(**kwargs)
     app.mainloop()
     app.withdraw()
+
+
+def build_manifest(argv=None):
+    """
+    Scan an extractions directory, and write a manifest of all data products.
+
+    The manifest can be passed to `pyGCG` using the ``manifest_path`` key in
+    the configuration file, in which case the directory is not scanned at
+    startup.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        The command line arguments. By default, these are read from
+        ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pygcg-manifest",
+        description="Write a manifest of the grizli data products in a directory.",
+    )
+    parser.add_argument("extractions_dir", help="The directory to scan.")
+    parser.add_argument(
+        "manifest_path",
+        help="The output file. The format (FITS or ECSV) is set by the suffix.",
+    )
+    parser.add_argument(
+        "--seg-id-length",
+        type=int,
+        default=5,
+        help="The number of characters in the zero-padded segmentation ID.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=8,
+        help="The number of threads used to scan the directory.",
+    )
+    args = parser.parse_args(argv)
+
+    scan_start = time.perf_counter()
+    index = ProductIndex.build(
+        fpe(args.extractions_dir), pad=args.seg_id_length, n_threads=args.threads
+    )
+    index.write_manifest(fpe(args.manifest_path), n_threads=args.threads)
+    print(
+        f"Wrote {sum(len(p) for e in index.products.values() for p in e.values())} "
+        f"products for {len(index)} objects to {args.manifest_path} "
+        f"in {time.perf_counter() - scan_start:.2f}s."
+    )
+
+
+def merge_outputs(argv=None):
+    """
+    Merge the output catalogues of multiple annotators.
+
+    Each object is identified by its ``SEG_ID``, and the merged catalogue
+    contains the consensus beam qualities, disagreement flags, and the
+    scatter in the estimated redshifts.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        The command line arguments. By default, these are read from
+        ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pygcg-merge",
+        description="Merge the classifications of multiple annotators.",
+    )
+    parser.add_argument(
+        "input_paths",
+        nargs="+",
+        help="The output catalogues or SQLite databases to merge.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="The merged catalogue. The format is set by the suffix.",
+    )
+    parser.add_argument(
+        "--z-tolerance",
+        type=float,
+        default=0.05,
+        help="Flag objects where the redshifts differ by more than this, "
+        "multiplied by (1+z).",
+    )
+    args = parser.parse_args(argv)
+
+    merge_start = time.perf_counter()
+    tables = [read_classifications(fpe(p)) for p in args.input_paths]
+    merged = merge_classifications(tables, z_tolerance=args.z_tolerance)
+    merged.write(fpe(args.output), overwrite=True)
+    print(
+        f"Merged {sum(len(t) for t in tables)} classifications of "
+        f"{len(merged)} objects to {args.output} "
+        f"in {time.perf_counter() - merge_start:.2f}s."
+    )
+
+
+def export_outputs(argv=None):
+    """
+    Join the classifications to the full input catalogue.
+
+    The input catalogue is streamed in chunks of rows, so that the memory
+    used does not depend on its length.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        The command line arguments. By default, these are read from
+        ``sys.argv``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pygcg-export",
+        description="Join the classifications to the input catalogue.",
+    )
+    parser.add_argument("cat_path", help="The input catalogue.")
+    parser.add_argument(
+        "input_paths",
+        nargs="+",
+        help="The output catalogues or SQLite databases. If more than one "
+        "annotator is found, the classifications are merged first.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="The joined catalogue. The format (FITS, CSV or ECSV) is set by "
+        "the suffix.",
+    )
+    parser.add_argument(
+        "--seg-id-col",
+        default="NUMBER",
+        help="The name of the segmentation ID column in the input catalogue.",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=100000,
+        help="The number of rows processed at once.",
+    )
+    args = parser.parse_args(argv)
+
+    export_start = time.perf_counter()
+    tables = [read_classifications(fpe(p)) for p in args.input_paths]
+    if len(np.unique(np.concatenate([np.asarray(t["ANNOTATOR"]) for t in tables]))) > 1:
+        classifications = merge_classifications(tables)
+    else:
+        classifications = vstack(tables, metadata_conflicts="silent")
+    n_rows, n_classified = export_catalogue(
+        fpe(args.cat_path),
+        classifications,
+        fpe(args.output),
+        args.seg_id_col,
+        chunk_rows=args.chunk_rows,
+    )
+    print(
+        f"Wrote {n_rows} rows ({n_classified} classified) to {args.output} "
+        f"in {time.perf_counter() - export_start:.2f}s."
+    )
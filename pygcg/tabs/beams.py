@@ -24,6 +24,15 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolb
 from matplotlib.figure import Figure
 from tqdm import tqdm
 
+from pygcg.utils import (
+    STACK_EXTNAMES,
+    StackProduct,
+    fit_cell,
+    grid_cells,
+    has_extension,
+    paint_panel,
+)
+
 
 class BeamFrame(ctk.CTkFrame):
     def __init__(self, master, gal_id, PA, **kwargs):
@@ -39,6 +48,16 @@ class BeamFrame(ctk.CTkFrame):
         self.PA = PA
         self.settings_frame.grid_columnconfigure(8, weight=1)
 
+        render_label = ctk.CTkLabel(self.settings_frame, text="Render:")
+        render_label.grid(row=0, column=0, padx=(20, 5), pady=10, sticky="e")
+        self.render_menu = ctk.CTkOptionMenu(
+            self.settings_frame,
+            values=["Axes", "Mosaic"],
+            command=self.change_render,
+        )
+        self.render_menu.grid(row=0, column=1, padx=(5, 20), pady=10, sticky="w")
+        self.render_menu.set(self._root().plot_options["render"])
+
         cmap_label = ctk.CTkLabel(self.settings_frame, text="Colourmap:")
         cmap_label.grid(row=0, column=2, padx=(20, 5), pady=10, sticky="e")
         self.cmap_menu = ctk.CTkOptionMenu(
@@ -96,33 +115,32 @@ class BeamFrame(ctk.CTkFrame):
 
         self.gal_id = gal_id
         try:
-            pad = self._root().config.get("catalogue", {}).get("seg_id_length", 5)
-            self.file_path = [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.stack.fits"
-                )
-            ] + [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.spec2D.fits"
-                )
-            ]
-            self.file_path = self.file_path[0]
+            self.file_path = self._root().product_index.first(
+                self._root().seg_id, "stack", "spec2D"
+            )
         except:
             self.file_path = None
 
         self.generate_grid()
 
+    # The display options only change the artists, and the data is not read
+    # again
     def change_cmap(self, event=None):
         self._root().plot_options["cmap"] = event
-        self.update_grid(force_update=True)
+        self.beam_single_PA_frame.update_cmap()
 
     def change_stretch(self, event=None):
         self._root().plot_options["stretch"] = event
-        self.update_grid(force_update=True)
+        self.beam_single_PA_frame.update_norms()
 
     def change_limits(self, event=None):
         self._root().plot_options["limits"] = event
-        self.update_grid(force_update=True)
+        self.beam_single_PA_frame.update_norms()
+
+    def change_render(self, event=None):
+        self._root().plot_options["render"] = event
+        self._root().config["appearance"]["beam_render"] = event.lower()
+        self.beam_single_PA_frame.update_plots()
 
     def update_grid(self, force_update=False):
         if self.gal_id == self._root().current_gal_id.get() and not force_update:
@@ -135,36 +153,23 @@ class BeamFrame(ctk.CTkFrame):
             pass
         else:
             self.gal_id = self._root().current_gal_id.get()
-            pad = self._root().config.get("catalogue", {}).get("seg_id_length", 5)
-            self.file_path = [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.stack.fits"
-                )
-            ] + [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.spec2D.fits"
-                )
-            ]
-            self.file_path = self.file_path[0]
-
-            extver_list = [s for s in self._root().poss_extvers if self.PA in s]
-            self.beam_single_PA_frame.update_plots(extvers=extver_list)
+            self.file_path = self._root().product_index.first(
+                self._root().seg_id, "stack", "spec2D"
+            )
+            self.beam_single_PA_frame.update_plots(extvers=self.get_extvers())
 
             self.update()
 
-    def generate_grid(self):
-        with pf.open(self.file_path) as hdul:
-            header = hdul[0].header
-            n_grism = header["NGRISM"]
-            n_pa = np.nanmax(
-                [header[f"N{header[f'GRISM{n:0>3}']}"] for n in range(1, n_grism + 1)]
-            )
-            extver_list = [s for s in self._root().poss_extvers if self.PA in s]
+    def get_extvers(self):
+        # The position angle is compared exactly, so that e.g. "72.0" does not
+        # also match "172.0"
+        return [s for s in self._root().poss_extvers if s.rsplit(",", 1)[-1] == self.PA]
 
-            self.beam_single_PA_frame = SinglePABeamFrame(self, extvers=extver_list)
-            self.beam_single_PA_frame.grid(row=1, column=0, sticky="news")
-            self.grid_rowconfigure(1, weight=1)
-            self.grid_columnconfigure(0, weight=1)
+    def generate_grid(self):
+        self.beam_single_PA_frame = SinglePABeamFrame(self, extvers=self.get_extvers())
+        self.beam_single_PA_frame.grid(row=1, column=0, sticky="news")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
 
     def save_beam_figure(self):
 
@@ -210,21 +215,63 @@ class SinglePABeamFrame(ctk.CTkFrame):
 
         self.extvers = extvers
         self.coverage = {}
-        widths = [1 / 3, 1] * 3
-        self.fig_axes = self.fig.subplots(
-            4,
-            6,
-            sharey=True,
-            width_ratios=widths,
-        )
+        self.reported_failures = set()
+        self.n_beams = max(len(self.extvers), 1)
+        self.shown_extvers = list(self.extvers)
+        self.axes_extvers = None
+        self.allocate_axes(self.extvers)
 
         self.quality_frame = MultiQualityFrame(self.canvas_frame, extvers=self.extvers)
         self.quality_frame.grid(row=1, column=0, sticky="ew")
 
-        self.set_aspect()
-        self.plotted_images = dict()
+        # The alternative render mode, which draws every panel into a single
+        # image
+        self.mosaic_ax = None
+        self.mosaic_shown = None
+        self.mosaic_image = None
+        self.mosaic_buffer = None
+        self.mosaic_text = {}
+        self.fig.canvas.mpl_connect("resize_event", self.resize_mosaic)
+
+        self.set_aspect(aspect_ratio=self.n_beams)
         self.update_plots()
 
+    def allocate_axes(self, extvers):
+        # Each beam has a narrow column for the kernel, and a wider one for
+        # the spectrum
+        if extvers == self.axes_extvers:
+            return
+        if self.axes_extvers is not None:
+            for ax in self.fig_axes.flat:
+                ax.remove()
+        n_beams = max(len(extvers), 1)
+        self.fig_axes = self.fig.subplots(
+            4,
+            2 * n_beams,
+            sharey=True,
+            width_ratios=[1 / 3, 1] * n_beams,
+            squeeze=False,
+        )
+        self.axes_extvers = list(extvers)
+        self.plotted_images = dict()
+        self.mosaic_shown = None
+
+    def find_shown_extvers(self):
+        # Panels are only allocated for the grisms and orientations recorded
+        # in the header of the stack file
+        meta = self.stack.meta
+        if meta is None:
+            return list(self.extvers)
+        shown = [
+            v
+            for v in self.extvers
+            if (len(meta["N_PA"]) == 0 or meta["N_PA"].get(v.split(",")[0], 0) > 0)
+            and any(has_extension(meta, e, v) for e in STACK_EXTNAMES)
+        ]
+        if len(shown) == 0:
+            return list(self.extvers)
+        return shown
+
     def check_axes_colours(self):
         self.fig.set_facecolor("none")
         if ctk.get_appearance_mode() == "Dark":
@@ -293,19 +340,44 @@ class SinglePABeamFrame(ctk.CTkFrame):
 
         self.master.gal_id = self._root().current_gal_id.get()
 
-        if self._root().plot_options["stretch"].lower() == "linear":
-            self.stretch_fn = LinearStretch
-        elif self._root().plot_options["stretch"].lower() == "square root":
-            self.stretch_fn = SqrtStretch
-        elif self._root().plot_options["stretch"].lower() == "logarithmic":
-            self.stretch_fn = LogStretch
+        self.set_stretch_fn()
 
+        # The file is read once, and shared with the other orientation tab
+        try:
+            self.stack = self._root().get_stack_product(self.master.file_path)
+        except Exception as e:
+            print(f"Could not read {self.master.file_path}: {e}")
+            self.stack = StackProduct(None)
+
+        # Beams which were not observed are not shown, and cannot be used
+        self.shown_extvers = self.find_shown_extvers()
+        for ver in self.extvers:
+            if ver not in self.shown_extvers:
+                self.disable_quality(ver)
+
+        if self.use_mosaic():
+            self.render_mosaic()
+            self.fig.canvas.draw_idle()
+            self.fig.canvas.get_tk_widget().grid(row=0, column=0, sticky="news")
+            return
+        self.allocate_axes(self.shown_extvers)
+        self.set_layout(mosaic=False)
+
+        # Missing extensions are found from the HDU index, rather than by
+        # trying to open each one
+        meta = self.stack.meta
         for j, name in enumerate(["SCI", "CONTAM", "MODEL", "RESIDUALS"]):
-            for i, ver in enumerate(self.extvers):
+            for i, ver in enumerate(self.shown_extvers):
                 if name + ver not in self.plotted_images.keys():
                     self.plotted_images[name + ver] = dict()
-                self.plot_kernel(self.fig_axes[j, 2 * i], name, ver)
-                self.plot_beam(self.fig_axes[j, (2 * i) + 1], name, ver)
+                if has_extension(meta, "KERNEL", ver) is False:
+                    self.kernel_missing(name, ver)
+                else:
+                    self.plot_kernel(self.fig_axes[j, 2 * i], name, ver)
+                if has_extension(meta, name, ver) is False:
+                    self.beam_missing(self.fig_axes[j, (2 * i) + 1], name, ver)
+                else:
+                    self.plot_beam(self.fig_axes[j, (2 * i) + 1], name, ver)
 
         # print("T2:", time.perf_counter() - t1)
 
@@ -315,159 +387,332 @@ class SinglePABeamFrame(ctk.CTkFrame):
 
         # print("T3:", time.perf_counter() - t1)
 
-    def plot_kernel(self, ax, ext, extver):
-        with pf.open(self.master.file_path) as hdul:
-            try:
-                data = hdul["KERNEL", extver].data
+    def set_stretch_fn(self):
+        if self._root().plot_options["stretch"].lower() == "linear":
+            self.stretch_fn = LinearStretch
+        elif self._root().plot_options["stretch"].lower() == "square root":
+            self.stretch_fn = SqrtStretch
+        elif self._root().plot_options["stretch"].lower() == "logarithmic":
+            self.stretch_fn = LogStretch
 
-                if self._root().plot_options["limits"] == "grizli default":
-                    vmax_kern = 1.1 * np.percentile(data, 99.5)
-                    interval = ManualInterval(vmin=-0.1 * vmax_kern, vmax=vmax_kern)
-                elif self._root().plot_options["limits"] == "Min-max":
-                    interval = MinMaxInterval()
+    def get_norm(self, ext, extver):
+        # The limits are cached by the stack product, for each extension and
+        # limits mode
+        vmin, vmax = self.stack.limits(ext, extver, self._root().plot_options["limits"])
+        return ImageNormalize(vmin=vmin, vmax=vmax, stretch=self.stretch_fn())
+
+    def iter_artists(self):
+        for name in ["SCI", "CONTAM", "MODEL", "RESIDUALS"]:
+            for ver in self.extvers:
+                images = self.plotted_images.get(name + ver, {})
+                for key, ext in [("kernel", "KERNEL"), ("beam", name)]:
+                    if key in images and images[key].get_visible():
+                        yield images[key], name, ext, ver
+
+    def update_cmap(self):
+        if self.use_mosaic():
+            self.render_mosaic()
+            self.fig.canvas.draw_idle()
+            return
+        for artist, _, _, _ in self.iter_artists():
+            artist.set_cmap(self._root().plot_options["cmap"])
+        self.fig.canvas.draw_idle()
+
+    def update_norms(self):
+        self.set_stretch_fn()
+        if self.use_mosaic():
+            self.render_mosaic()
+            self.fig.canvas.draw_idle()
+            return
+        for artist, name, ext, ver in self.iter_artists():
+            try:
+                artist.set_norm(self.get_norm(ext, ver))
+            except KeyError as e:
+                if ext == "KERNEL":
+                    self.kernel_missing(name, ver)
                 else:
-                    interval = PercentileInterval(
-                        float(self._root().plot_options["limits"].replace("%", ""))
-                    )
+                    self.beam_missing(artist.axes, name, ver)
+            except Exception as e:
+                print(f"Could not update the colour scale of {name} {ver}: {e}")
+        self.fig.canvas.draw_idle()
 
-                norm = ImageNormalize(
-                    data,
-                    interval=interval,
-                    stretch=self.stretch_fn(),
-                )
+    def use_mosaic(self):
+        return self._root().plot_options.get("render", "Axes").lower() == "mosaic"
+
+    def set_layout(self, mosaic=False):
+        if mosaic == self.mosaic_shown:
+            return
+        self.mosaic_shown = mosaic
+        for ax in self.fig_axes.flat:
+            ax.set_visible(not mosaic)
+        if mosaic and self.mosaic_ax is None:
+            self.mosaic_ax = self.fig.add_axes([0, 0, 1, 1])
+            self.mosaic_ax.set_axis_off()
+        if self.mosaic_ax is not None:
+            self.mosaic_ax.set_visible(mosaic)
+        if not mosaic:
+            for t in self.mosaic_text.values():
+                t.set_visible(False)
+        self.fig.set_layout_engine("none" if mosaic else "constrained")
+
+    def mosaic_label(self, key, x, y, text, visible=True, **kwargs):
+        # Labels are positioned in pixels, from the top left of the mosaic
+        height, width = self.mosaic_buffer.shape[:2]
+        pos = (x / width, 1 - y / height)
+        if key not in self.mosaic_text:
+            self.mosaic_text[key] = self.fig.text(*pos, text, **kwargs)
+        else:
+            self.mosaic_text[key].set_position(pos)
+            self.mosaic_text[key].set_text(text)
+        self.mosaic_text[key].set_color(self._root().text_colour)
+        self.mosaic_text[key].set_visible(visible)
+
+    def render_mosaic(self):
+        self.set_layout(mosaic=True)
+        # Only the labels of the beams shown are redrawn
+        for t in self.mosaic_text.values():
+            t.set_visible(False)
+
+        width, height = (self.fig.get_size_inches() * self.fig.dpi).astype(int)
+        if self.mosaic_buffer is None or self.mosaic_buffer.shape[:2] != (
+            height,
+            width,
+        ):
+            # Matplotlib composites floating point images faster than integers
+            self.mosaic_buffer = np.zeros((height, width, 4), dtype=np.float32)
+        else:
+            self.mosaic_buffer[:] = 0
+
+        font_px = mpl.rcParams["font.size"] * self.fig.dpi / 72
+        cells = grid_cells(
+            width,
+            height,
+            4,
+            [1 / 3, 1] * max(len(self.shown_extvers), 1),
+            margins=(int(2 * font_px), int(3.5 * font_px), 2, 2),
+        )
+        cmap = mpl.colormaps[self._root().plot_options["cmap"]]
+
+        meta = self.stack.meta
+        for j, name in enumerate(["SCI", "CONTAM", "MODEL", "RESIDUALS"]):
+            y0, y1, x0, _ = cells[j][0]
+            self.mosaic_label(
+                f"{name}_label",
+                x0 - 0.5 * font_px,
+                0.5 * (y0 + y1),
+                name,
+                rotation=90,
+                ha="right",
+                va="center",
+            )
+            for i, ver in enumerate(self.shown_extvers):
+                # As in the axes mode, a kernel which cannot be drawn leaves
+                # its panel empty
                 try:
-                    self.plotted_images[ext + extver]["kernel"].set_data(data)
-                    self.plotted_images[ext + extver]["kernel"].set_norm(norm)
-                    self.plotted_images[ext + extver]["kernel"].set_cmap(
-                        self._root().plot_options["cmap"]
+                    if has_extension(meta, "KERNEL", ver) is False:
+                        raise KeyError(ver)
+                    data = self.stack.get("KERNEL", ver)
+                    paint_panel(
+                        self.mosaic_buffer,
+                        fit_cell(cells[j][2 * i], data.shape),
+                        data,
+                        self.get_norm("KERNEL", ver),
+                        cmap,
                     )
-                    self.plotted_images[ext + extver]["kernel"].set_visible(True)
+                except KeyError as e:
+                    pass
                 except Exception as e:
-                    self.plotted_images[ext + extver]["kernel"] = ax.imshow(
+                    self.report_failure("KERNEL", ver, e)
+
+                missing = False
+                try:
+                    if has_extension(meta, name, ver) is False:
+                        raise KeyError(ver)
+                    data = self.stack.get(name, ver)
+                    if name == "SCI":
+                        self.coverage[ver] = self.stack.coverage(ver)
+                        self._root().current_gal_data[ver]["coverage"] = self.coverage[
+                            ver
+                        ]
+                    paint_panel(
+                        self.mosaic_buffer,
+                        cells[j][2 * i + 1],
                         data,
-                        origin="lower",
-                        cmap=self._root().plot_options["cmap"],
-                        # aspect="auto"
-                        norm=norm,
-                        visible=True,
-                        interpolation="nearest",
+                        self.get_norm(name, ver),
+                        cmap,
                     )
-                ax.set_xticklabels("")
-                ax.set_yticklabels("")
-                ax.tick_params(axis="both", direction="in", top=True, right=True)
-                if ax in self.fig_axes[:, 0]:
-                    ax.set_ylabel(ext)
+                except KeyError as e:
+                    missing = True
+                    self.disable_quality(ver)
+                except Exception as e:
+                    missing = True
+                    self.report_failure(name, ver, e)
+
+                y0, y1, x0, x1 = cells[j][2 * i + 1]
+                self.mosaic_label(
+                    f"{name}{ver}_failed",
+                    0.5 * (x0 + x1),
+                    0.5 * (y0 + y1),
+                    "No data",
+                    visible=missing,
+                    ha="center",
+                    va="center",
+                )
+
+        for i, ver in enumerate(self.shown_extvers):
+            y0, y1, x0, x1 = cells[-1][2 * i + 1]
+            try:
+                header = self.stack.header("SCI", ver)
+                wmin, wmax = f"{header['WMIN']:.2f}", f"{header['WMAX']:.2f}"
             except Exception as e:
-                if "kernel" in self.plotted_images[ext + extver].keys():
-                    self.plotted_images[ext + extver]["kernel"].set_visible(False)
-                pass
+                wmin, wmax = "", ""
+            self.mosaic_label(f"{ver}_wmin", x0, y1 + 2, wmin, ha="left", va="top")
+            self.mosaic_label(f"{ver}_wmax", x1, y1 + 2, wmax, ha="right", va="top")
+            self.mosaic_label(
+                f"{ver}_xlabel",
+                0.5 * (x0 + x1),
+                y1 + 1.5 * font_px,
+                r"$\lambda$ ($\mu$m) - " + ver.split(",")[0],
+                ha="center",
+                va="top",
+            )
 
-    def plot_beam(self, ax, ext, extver):
-        with pf.open(self.master.file_path) as hdul:
+        if self.mosaic_image is None:
+            self.mosaic_image = self.mosaic_ax.imshow(
+                self.mosaic_buffer,
+                extent=[0, width, height, 0],
+                aspect="auto",
+                interpolation="nearest",
+            )
+        else:
+            self.mosaic_image.set_data(self.mosaic_buffer)
+            self.mosaic_image.set_extent([0, width, height, 0])
+        self.mosaic_ax.set_xlim(0, width)
+        self.mosaic_ax.set_ylim(height, 0)
+
+    def resize_mosaic(self, event=None):
+        if self.use_mosaic() and hasattr(self, "stack"):
+            self.render_mosaic()
+            self.fig.canvas.draw_idle()
+
+    def plot_kernel(self, ax, ext, extver):
+        try:
+            data = self.stack.get("KERNEL", extver)
+            norm = self.get_norm("KERNEL", extver)
             try:
-                if ext == "RESIDUALS":
-                    data = hdul["SCI", extver].data
-                    m = hdul["MODEL", extver].data
-                else:
-                    data = hdul[ext, extver].data
-                    m = 0
-
-                if ext == "SCI":
-                    self.coverage[extver] = (
-                        1
-                        - np.sum(np.all((~np.isfinite(data)) | (data == 0), axis=0))
-                        / data.shape[1]
-                    )
-                    self._root().current_gal_data[extver]["coverage"] = self.coverage[
-                        extver
-                    ]
-
-                header = hdul["SCI", extver].header
-                extent = [header["WMIN"], header["WMAX"], 0, data.shape[0]]
-
-                if self._root().plot_options["limits"] == "grizli default":
-                    wht_i = hdul["WHT", extver]
-                    clip = wht_i.data > 0
-                    if clip.sum() == 0:
-                        clip = np.isfinite(wht_i.data)
-
-                    avg_rms = 1 / np.median(np.sqrt(wht_i.data[clip]))
-                    vmax = np.maximum(1.1 * np.percentile(data[clip], 98), 5 * avg_rms)
-                    vmin = -0.1 * vmax
-                    interval = ManualInterval(vmin=vmin, vmax=vmax)
-                elif self._root().plot_options["limits"] == "Min-max":
-                    interval = MinMaxInterval()
-                else:
-                    interval = PercentileInterval(
-                        float(self._root().plot_options["limits"].replace("%", ""))
-                    )
+                self.plotted_images[ext + extver]["kernel"].set_data(data)
+                self.plotted_images[ext + extver]["kernel"].set_norm(norm)
+                self.plotted_images[ext + extver]["kernel"].set_cmap(
+                    self._root().plot_options["cmap"]
+                )
+                self.plotted_images[ext + extver]["kernel"].set_visible(True)
+            except Exception as e:
+                self.plotted_images[ext + extver]["kernel"] = ax.imshow(
+                    data,
+                    origin="lower",
+                    cmap=self._root().plot_options["cmap"],
+                    # aspect="auto"
+                    norm=norm,
+                    visible=True,
+                    interpolation="nearest",
+                )
+            ax.set_xticklabels("")
+            ax.set_yticklabels("")
+            ax.tick_params(axis="both", direction="in", top=True, right=True)
+            if ax in self.fig_axes[:, 0]:
+                ax.set_ylabel(ext)
+        except Exception as e:
+            self.kernel_missing(ext, extver)
+
+    def kernel_missing(self, ext, extver):
+        if "kernel" in self.plotted_images[ext + extver].keys():
+            self.plotted_images[ext + extver]["kernel"].set_visible(False)
+
+    def plot_beam(self, ax, ext, extver):
+        try:
+            data = self.stack.get(ext, extver)
 
-                norm = ImageNormalize(
+            if ext == "SCI":
+                self.coverage[extver] = self.stack.coverage(extver)
+                self._root().current_gal_data[extver]["coverage"] = self.coverage[
+                    extver
+                ]
+
+            header = self.stack.header("SCI", extver)
+            extent = [header["WMIN"], header["WMAX"], 0, data.shape[0]]
+
+            norm = self.get_norm(ext, extver)
+            try:
+                self.plotted_images[ext + extver]["beam"].set_data(data)
+                self.plotted_images[ext + extver]["beam"].set_norm(norm)
+                self.plotted_images[ext + extver]["beam"].set_cmap(
+                    self._root().plot_options["cmap"]
+                )
+                self.plotted_images[ext + extver]["beam"].set_visible(True)
+            except:
+                self.plotted_images[ext + extver]["beam"] = ax.imshow(
                     data,
-                    interval=interval,
-                    stretch=self.stretch_fn(),
+                    origin="lower",
+                    cmap=self._root().plot_options["cmap"],
+                    aspect="auto",
+                    norm=norm,
+                    extent=extent,
+                    visible=True,
+                    interpolation="nearest",
                 )
-                try:
-                    self.plotted_images[ext + extver]["beam"].set_data(data - m)
-                    self.plotted_images[ext + extver]["beam"].set_norm(norm)
-                    self.plotted_images[ext + extver]["beam"].set_cmap(
-                        self._root().plot_options["cmap"]
-                    )
-                    self.plotted_images[ext + extver]["beam"].set_visible(True)
-                except:
-                    self.plotted_images[ext + extver]["beam"] = ax.imshow(
-                        data - m,
-                        origin="lower",
-                        cmap=self._root().plot_options["cmap"],
-                        aspect="auto",
-                        norm=norm,
-                        extent=extent,
-                        visible=True,
-                        interpolation="nearest",
-                    )
-                ax.tick_params(axis="both", direction="in", top=True, right=True)
+            ax.tick_params(axis="both", direction="in", top=True, right=True)
 
-                if ax not in self.fig_axes[-1]:
-                    ax.set_xticklabels("")
-                    ax.set_yticklabels("")
-                else:
-                    ax.set_xlabel(r"$\lambda$ ($\mu$m) - " + extver.split(",")[0])
-                try:
-                    self.plotted_images[ext + extver]["beam_failed"].set_visible(False)
-                except:
-                    pass
-            except KeyError as e:
-                # print (e)
-                try:
-                    self.plotted_images[ext + extver]["beam_failed"].set_visible(True)
-                except Exception as e:
-                    # print (e)
-
-                    self.plotted_images[ext + extver]["beam_failed"] = ax.text(
-                        0.5,
-                        0.5,
-                        "No data",
-                        transform=ax.transAxes,
-                        ha="center",
-                        va="center",
-                        c=self._root().text_colour,
-                    )
-                try:
-                    self.plotted_images[ext + extver]["beam"].set_visible(False)
-                except:
-                    pass
-                self._root().current_gal_data[extver]["coverage"] = 0.0
-                self.quality_frame.quality_menus[extver].set("Unusable")
-                self.quality_frame.quality_menus[extver].configure(state="disabled")
-            except Exception as e:
-                print("beam:", e)
+            if ax not in self.fig_axes[-1]:
+                ax.set_xticklabels("")
+                ax.set_yticklabels("")
+            else:
+                ax.set_xlabel(r"$\lambda$ ($\mu$m) - " + extver.split(",")[0])
+            try:
+                self.plotted_images[ext + extver]["beam_failed"].set_visible(False)
+            except:
                 pass
+        except KeyError as e:
+            self.beam_missing(ax, ext, extver)
+        except Exception as e:
+            self.report_failure(ext, extver, e)
+
+    def report_failure(self, ext, extver, e):
+        # The panels are redrawn on every resize, so each failure is only
+        # printed once per object
+        key = (self.master.gal_id, ext, extver)
+        if key not in self.reported_failures:
+            self.reported_failures.add(key)
+            print(f"Could not draw {ext} {extver} for object {key[0]}: {e}")
+
+    def beam_missing(self, ax, ext, extver):
+        try:
+            self.plotted_images[ext + extver]["beam_failed"].set_visible(True)
+        except Exception as e:
+            self.plotted_images[ext + extver]["beam_failed"] = ax.text(
+                0.5,
+                0.5,
+                "No data",
+                transform=ax.transAxes,
+                ha="center",
+                va="center",
+                c=self._root().text_colour,
+            )
+        try:
+            self.plotted_images[ext + extver]["beam"].set_visible(False)
+        except:
+            pass
+        self.disable_quality(extver)
+
+    def disable_quality(self, extver):
+        self._root().current_gal_data[extver]["coverage"] = 0.0
+        self.quality_frame.quality_menus[extver].set("Unusable")
+        self.quality_frame.quality_menus[extver].configure(state="disabled")
 
 
 class MultiQualityFrame(ctk.CTkFrame):
     def __init__(self, master, extvers, **kwargs):
         super().__init__(master, **kwargs)
-        self.columnconfigure((0, 1, 2, 3, 4, 5), weight=1)
+        self.columnconfigure(tuple(range(2 * max(len(extvers), 1))), weight=1)
         self.extvers = extvers
         self.quality_menus = {}
 
@@ -495,6 +740,9 @@ class MultiQualityFrame(ctk.CTkFrame):
     def keypress_select(self, char, key_maps):
         if char in key_maps:
             idx = np.argwhere(char == key_maps)[0]
+            # There may be more rows of keys than beams, and vice versa
+            if idx[0] >= len(self.extvers):
+                return
             self._root().current_gal_data[self.extvers[idx[0]]]["quality"] = (
                 self.possible_values[idx[1]]
             )
@@ -1,3 +1,4 @@
+from itertools import cycle
 from pathlib import Path
 
 import astropy.io.fits as pf
@@ -33,10 +34,12 @@ except:
 from tqdm import tqdm
 
 from pygcg.utils import (
+    SegmentationIndex,
     ValidateFloatVar,
     VerticalNavigationToolbar2Tk,
-    check_deg,
     error_bar_visibility,
+    partition_percentiles,
+    pixel_coordinates,
     update_errorbar,
 )
 
@@ -413,70 +416,15 @@ class SpecFrame(ctk.CTkFrame):
         self.fig.set_layout_engine("none")
 
     def _update_data(self):
-        pad = self._root().config.get("catalogue", {}).get("seg_id_length", 5)
-
-        # Check if *row data exists (small file, default grizli reduction)
-        try:
-            _row_path = [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.row.fits"
-                )
-            ][0]
-            with pf.open(_row_path) as hdul:
-                _tab_data = Table(hdul[1].data)
-                grizli_redshift = _tab_data["redshift"].value[0]
-
-                try:
-                    line_names = _tab_data["haslines"].value[0].split()
-                    self.line_info_dict = {}
-                    for l in line_names:
-                        self.line_info_dict[l] = {}
-                        self.line_info_dict[l]["flux"] = _tab_data[f"flux_{l}"].value[0]
-                        self.line_info_dict[l]["sn"] = _tab_data[f"sn_{l}"].value[0]
-                except Exception as e:
-                    self.line_info_dict = {}
-
-        except Exception as e:
-            try:
-                # Check if *full [GLASS] or *maps [PASSAGE] files exist
-                _full_path = (
-                    [
-                        *self._root().extractions_dir.glob(
-                            f"**/*{self._root().seg_id:0>{pad}}.full.fits"
-                        )
-                    ]
-                    + [
-                        *self._root().extractions_dir.glob(
-                            f"**/*{self._root().seg_id:0>{pad}}.maps.fits"
-                        )
-                    ]
-                    + [
-                        *self._root().extractions_dir.glob(
-                            f"**/*{self._root().seg_id:0>{pad}}.zinfo.fits"
-                        )
-                    ]
-                )
-                _full_path = _full_path[0]
-                with pf.open(_full_path) as hdul:
-                    grizli_redshift = hdul[1].header["Z_MAP"]
-                    _line_hdr = hdul[0].header
-
-                    try:
-                        line_names = _line_hdr["HASLINES"].split()
-                        self.line_info_dict = {}
-                        for i_l, l in enumerate(line_names):
-                            self.line_info_dict[l] = {}
-                            self.line_info_dict[l]["flux"] = _line_hdr[
-                                f"flux{i_l+1:0>3}"
-                            ]
-                            self.line_info_dict[l]["sn"] = (
-                                _line_hdr[f"flux{i_l+1:0>3}"]
-                                / _line_hdr[f"err{i_l+1:0>3}"]
-                            )
-                    except Exception as e:
-                        self.line_info_dict = {}
-            except Exception as e:
-                grizli_redshift = 0.0
+        # The redshift and lines are read from the field-wide summary, which
+        # falls back to the *row, *full, or *maps files if not yet cached
+        summary = self._root().grizli_summary.get(self._root().seg_id)
+        if summary is None:
+            grizli_redshift = 0.0
+            self.line_info_dict = {}
+        else:
+            grizli_redshift = summary["redshift"]
+            self.line_info_dict = {l: dict(v) for l, v in summary["lines"].items()}
 
         self.grizli_redshift = self._root().current_gal_data.get(
             "grizli_redshift", grizli_redshift
@@ -623,25 +571,9 @@ class SpecFrame(ctk.CTkFrame):
         self.images_frame.update_images()
 
     def plot_grizli(self, templates=False):
-        pad = self._root().config.get("catalogue", {}).get("seg_id_length", 5)
-        file_path = (
-            [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.1D.fits"
-                )
-            ]
-            + [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.spec1D.fits"
-                )
-            ]
-            + [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.1D_RC.fits"
-                )
-            ]
-        )
-        file_path = file_path[0]
+        file_path = self._root().product_index.get(
+            self._root().seg_id, "1D", "spec1D", "1D_RC"
+        )[0]
 
         if templates:
             dict_key = "grism_templates"
@@ -650,11 +582,12 @@ class SpecFrame(ctk.CTkFrame):
 
         # wavelength, flux, flux alternative
         data_lims = np.array([[10130, 22260], [0.0, 1.0], [0.0, 1.0]], dtype=float)
-        colours = {
-            self._root().filter_names[0]: "C1",
-            self._root().filter_names[1]: "C2",
-            self._root().filter_names[2]: "C0",
-        }
+        colours = dict(
+            zip(
+                self._root().filter_names,
+                cycle(["C1", "C2", "C0", "C3", "C4", "C5", "C6", "C7", "C8", "C9"]),
+            )
+        )
 
         if dict_key not in self.plotted_components.keys():
             self.plotted_components[dict_key] = dict()
@@ -1181,10 +1114,18 @@ class ImagesFrame(ctk.CTkFrame):
         else:
             seg_paths = sorted(seg_paths, key=len)
             self.seg_path = Path(seg_paths[0])
+            if (
+                not hasattr(self, "seg_index")
+                or self.seg_index.seg_path != self.seg_path
+            ):
+                self.seg_index = SegmentationIndex(
+                    self.seg_path, fallback_dir=getattr(self._root(), "temp_dir", None)
+                )
 
     def update_rgb_path(self):
+        # The first three filters are used for the red, green and blue channels
         self.rgb_paths = []
-        for p in self._root().filter_names:
+        for p in self._root().filter_names[:3]:
             rgb_paths = [
                 str(s)
                 for s in self._root().prep_dir.glob(f"*{p.lower()}*_dr[zc]_sci.fits")
@@ -1220,27 +1161,32 @@ class ImagesFrame(ctk.CTkFrame):
             )
 
     def plot_images(self, border=5):
-        plot_names = self._root().filter_names[::-1] + ["rgb", "seg"]
+        plot_names = self._root().filter_names[:3][::-1] + ["rgb", "seg"]
 
         try:
             with pf.open(self.seg_path) as hdul:
                 seg_wcs = WCS(hdul[0].header)
-                seg_data = hdul[0].data
-
-                y_c, x_c = extract_pixel_ra_dec(
-                    self._root().tab_row,
-                    seg_wcs,
-                    key_ra=self._root()
-                    .config.get("catalogue", {})
-                    .get("ra", "X_WORLD"),
-                    key_dec=self._root()
-                    .config.get("catalogue", {})
-                    .get("dec", "Y_WORLD"),
-                ).value
-
-                location = np.where(seg_data == self._root().seg_id)
-                width = np.nanmax(location[0]) - np.nanmin(location[0])
-                height = np.nanmax(location[1]) - np.nanmin(location[1])
+                seg_shape = hdul[0].shape
+
+                try:
+                    y_c = float(self._root().tab_row["SEG_X"])
+                    x_c = float(self._root().tab_row["SEG_Y"])
+                except KeyError:
+                    y_c, x_c = extract_pixel_ra_dec(
+                        self._root().tab_row,
+                        seg_wcs,
+                        key_ra=self._root()
+                        .config.get("catalogue", {})
+                        .get("ra", "X_WORLD"),
+                        key_dec=self._root()
+                        .config.get("catalogue", {})
+                        .get("dec", "Y_WORLD"),
+                    ).value
+
+                # Only the cutout is read, using the precomputed bounding box
+                y_min, y_max, x_min, x_max = self.seg_index.bbox(self._root().seg_id)
+                width = y_max - y_min
+                height = x_max - x_min
 
                 if width > height:
                     w_d = 0
@@ -1252,31 +1198,19 @@ class ImagesFrame(ctk.CTkFrame):
                     w_d, h_d = 0, 0
 
                 self.cutout_dimensions = [
-                    int(
-                        np.clip(
-                            np.nanmin(location[0]) - border - w_d, 0, seg_data.shape[0]
-                        )
-                    ),
-                    int(
-                        np.clip(
-                            np.nanmax(location[0]) + border + w_d, 0, seg_data.shape[0]
-                        )
-                    ),
-                    int(
-                        np.clip(
-                            np.nanmin(location[1]) - border - h_d, 0, seg_data.shape[1]
-                        )
-                    ),
-                    int(
-                        np.clip(
-                            np.nanmax(location[1]) + border + h_d, 0, seg_data.shape[1]
-                        )
-                    ),
+                    int(np.clip(y_min - border - w_d, 0, seg_shape[0])),
+                    int(np.clip(y_max + border + w_d, 0, seg_shape[0])),
+                    int(np.clip(x_min - border - h_d, 0, seg_shape[1])),
+                    int(np.clip(x_max + border + h_d, 0, seg_shape[1])),
                 ]
-                cutout = seg_data[
-                    self.cutout_dimensions[0] : self.cutout_dimensions[1],
-                    self.cutout_dimensions[2] : self.cutout_dimensions[3],
-                ].astype(float)
+                cutout = (
+                    hdul[0]
+                    .section[
+                        self.cutout_dimensions[0] : self.cutout_dimensions[1],
+                        self.cutout_dimensions[2] : self.cutout_dimensions[3],
+                    ]
+                    .astype(float)
+                )
                 cutout[cutout == 0] = np.nan
 
                 cutout_copy = cutout % 5 + 1
@@ -1303,12 +1237,8 @@ class ImagesFrame(ctk.CTkFrame):
                 self.fig_axes[-1].set_xlim(xmax=cutout_copy.shape[0])
                 self.fig_axes[-1].set_ylim(ymax=cutout_copy.shape[1])
 
-                marker_xs = y_c - int(
-                    np.clip(np.nanmin(location[1]) - border - h_d, 0, seg_data.shape[1])
-                )
-                marker_ys = x_c - int(
-                    np.clip(np.nanmin(location[0]) - border - w_d, 0, seg_data.shape[0])
-                )
+                marker_xs = y_c - int(np.clip(x_min - border - h_d, 0, seg_shape[1]))
+                marker_ys = x_c - int(np.clip(y_min - border - w_d, 0, seg_shape[0]))
                 try:
                     self.plotted_components["seg_marker"].set_offsets(
                         (marker_xs, marker_ys)
@@ -1332,7 +1262,7 @@ class ImagesFrame(ctk.CTkFrame):
             )
 
         try:
-            self.rgb_data = np.empty(
+            self.rgb_data = np.zeros(
                 (
                     3,
                     self.cutout_dimensions[1] - self.cutout_dimensions[0],
@@ -1356,7 +1286,7 @@ class ImagesFrame(ctk.CTkFrame):
                             except:
                                 # Dawn JWST products
                                 zp = 28.9
-                        self.rgb_data[i] = hdul[0].data[
+                        self.rgb_data[i] = hdul[0].section[
                             self.cutout_dimensions[0] : self.cutout_dimensions[1],
                             self.cutout_dimensions[2] : self.cutout_dimensions[3],
                         ] * 10 ** ((zp - 25) / 2.5)
@@ -1395,12 +1325,17 @@ class ImagesFrame(ctk.CTkFrame):
                 self.plotted_components["rgb_failed"].set_visible(False)
 
             vmax = np.nanmax(
-                [1.1 * np.percentile(self.rgb_data, 98), 5 * np.std(self.rgb_data)]
+                [
+                    1.1 * partition_percentiles(self.rgb_data, 98),
+                    5 * np.std(self.rgb_data),
+                ]
             )
             vmin = -0.1 * vmax
             interval = ManualInterval(vmin=vmin, vmax=vmax)
             for a, d, f in zip(
-                self.fig_axes[:-2][::-1], self.rgb_data, self._root().filter_names
+                self.fig_axes[:-2][::-1],
+                self.rgb_data,
+                self._root().filter_names[:3],
             ):
                 try:
                     norm = ImageNormalize(
@@ -1489,41 +1424,10 @@ def extract_pixel_radius(q_table, celestial_wcs, key="flux_radius"):
 
 
 def extract_pixel_ra_dec(q_table, celestial_wcs, key_ra="ra", key_dec="dec"):
-    try:
-        orig_ra = q_table[key_ra]
-        orig_dec = q_table[key_dec]
-    except:
-        print(
-            "No match found for supplied ra, dec keys. Performing automatic search instead."
-        )
-        lower_colnames = np.array([x.lower() for x in q_table.colnames])
-        for r, d in [[key_ra, key_dec], ["ra", "dec"]]:
-            possible_names = []
-            for n in lower_colnames:
-                if d.lower() in n:
-                    possible_names.append(n)
-            possible_names = sorted(possible_names, key=lambda x: (len(x), x))
-            for n in possible_names:
-                r_poss = n.replace(d.lower(), r.lower())
-                if r_poss in lower_colnames:
-                    orig_ra = q_table[
-                        q_table.colnames[int((lower_colnames == r_poss).nonzero()[0])]
-                    ]
-                    orig_dec = q_table[
-                        q_table.colnames[int((lower_colnames == n).nonzero()[0])]
-                    ]
-                    break
-            else:
-                continue
-            break
-
-    new_ra, new_dec = check_deg(orig_ra), check_deg(orig_dec)
-    if new_ra.unit == u.pix:
-        return new_ra, new_dec
-
-    sc = SkyCoord(new_ra, new_dec)
-    pix_c = np.hstack(sc.to_pixel(celestial_wcs)[:]) * u.pix
-    return pix_c
+    pix_x, pix_y = pixel_coordinates(
+        q_table, celestial_wcs, key_ra=key_ra, key_dec=key_dec
+    )
+    return np.hstack([pix_x, pix_y])
 
 
 class RedshiftPlotFrame(ctk.CTkFrame):
@@ -1571,33 +1475,15 @@ class RedshiftPlotFrame(ctk.CTkFrame):
         self.fig.canvas.get_tk_widget().config(bg=self._root().bg_colour_name)
 
     def update_fits_path(self):
-        pad = self._root().config.get("catalogue", {}).get("seg_id_length", 5)
-        self.fits_path = (
-            [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.full.fits"
-                )
-            ]
-            + [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.maps.fits"
-                )
-            ]
-            + [
-                *self._root().extractions_dir.glob(
-                    f"**/*{self._root().seg_id:0>{pad}}.zinfo.fits"
-                )
-            ]
+        self.fits_path = self._root().product_index.first(
+            self._root().seg_id, "full", "maps", "zinfo"
         )
-        if len(self.fits_path) == 0:
+        if self.fits_path is None:
             print("Full extraction data not found.")
-            self.fits_path = None
-        else:
-            self.fits_path = self.fits_path[0]
 
     def plot_z_grid(self):
         try:
-            with pf.open(self.fits_path) as hdul_all:
+            with self._root().hdu_offsets.open(self.fits_path) as hdul_all:
                 hdul = hdul_all["ZFIT_STACK"]
                 try:
                     self.plotted_components["chi2_grid"].set_data(
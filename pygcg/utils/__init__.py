@@ -1,4 +1,23 @@
+from .cache import FileCache
+from .catalogue import CATALOGUE_KEYS, catalogue_columns, read_catalogue
+from .database import ClassificationDatabase, read_database
+from .export import (
+    EXPORT_FORMATS,
+    ChunkedTableWriter,
+    catalogue_template,
+    export_catalogue,
+    iter_catalogue_chunks,
+    join_classifications,
+)
+from .headers import (
+    STACK_EXTNAMES,
+    has_extension,
+    read_stack_metadata,
+    stack_metadata,
+)
 from .icon_checkbox import IconCheckBox
+from .journal import ClassificationJournal, add_record, index_rows, update_record
+from .merge import merge_classifications, read_classifications
 from .misc import (
     ValidateFloatVar,
     check_deg,
@@ -7,4 +26,57 @@ from .misc import (
     fpe,
     update_errorbar,
 )
+from .mosaic import fit_cell, grid_cells, paint_panel
+from .object_queue import ObjectQueue
+from .offsets import (
+    RECORDED_KEYWORDS,
+    HDUOffsetIndex,
+    HDUReader,
+    scan_hdu_offsets,
+)
+from .products import (
+    PRODUCT_TYPES,
+    ProductIndex,
+    parse_product_name,
+    scan_tree,
+    walk_tree,
+)
+from .redshifts import GrizliSummary, read_grizli_summary
+from .schema import (
+    FLAG_BITS,
+    QUALITY_CODES,
+    QUALITY_LEVELS,
+    beam_names,
+    decode_quality,
+    encode_quality,
+    encode_record,
+    grism_names,
+    migrate_output,
+    output_columns,
+    output_table,
+    pack_flags,
+    unpack_flags,
+)
+from .segmentation import (
+    SegmentationIndex,
+    find_ra_dec_columns,
+    pixel_coordinates,
+    seg_bounding_boxes,
+)
+from .session import (
+    SESSION_VERSION,
+    config_signature,
+    file_stamps,
+    read_session,
+    write_session,
+)
+from .stack import StackProduct
+from .stats import (
+    benchmark_percentiles,
+    histogram_percentiles,
+    partition_percentiles,
+    percentile_interval,
+)
 from .toolbar import VerticalNavigationToolbar2Tk
+from .watcher import ProductWatcher
+from .writer import CatalogueWriter
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+
+
+class FileCache:
+    """
+    A JSON cache of values read from files.
+
+    Each entry records the path, size and modification time of the file it
+    was read from, and is read again if any of these change. Subclasses
+    define how a file is read, by implementing `read_file`.
+
+    Parameters
+    ----------
+    cache_path : str or os.PathLike, optional
+        A JSON file in which the cache is stored between sessions.
+    """
+
+    # Used to describe the cache in error messages
+    description = "cache"
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if cache_path is not None:
+            try:
+                with open(cache_path, mode="rt", encoding="utf-8") as fp:
+                    self.entries = json.load(fp)
+            except (OSError, ValueError):
+                pass
+
+    def read_file(self, path):
+        """
+        Read the value to be cached from a file.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The file.
+
+        Returns
+        -------
+        object
+            Any value which can be stored as JSON.
+        """
+        raise NotImplementedError
+
+    def lookup(self, key, path, read=True):
+        """
+        Return the cached value for a file, reading the file if necessary.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        path : str or os.PathLike
+            The file from which the value is read.
+        read : bool, optional
+            If ``False``, ``None`` is returned instead of reading the file,
+            when there is no valid entry. By default ``True``.
+
+        Returns
+        -------
+        object
+            The output of `read_file`.
+
+        Raises
+        ------
+        OSError
+            If the file cannot be accessed.
+        """
+        stat = os.stat(path)
+        entry = self.entries.get(key)
+        if (
+            entry is not None
+            and entry.get("path") == str(path)
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime") == stat.st_mtime_ns
+            and "value" in entry
+        ):
+            return entry["value"]
+        if not read:
+            return None
+        value = self.read_file(path)
+        with self._lock:
+            self.entries[key] = {
+                "path": str(path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "value": value,
+            }
+        return value
+
+    def values(self):
+        """
+        Return a copy of all cached values.
+
+        Returns
+        -------
+        dict
+            The value of each entry, keyed as in `lookup`.
+        """
+        with self._lock:
+            return {k: e["value"] for k, e in self.entries.items() if "value" in e}
+
+    def write(self):
+        """
+        Save the cache to ``cache_path``.
+
+        The cache is written to a temporary file, which then replaces the
+        previous version, so that an interrupted write never leaves a
+        truncated file behind.
+        """
+        if self.cache_path is None:
+            return
+        with self._lock:
+            contents = json.dumps(self.entries, separators=(",", ":"))
+        # Each thread uses its own temporary file, in the same directory
+        tmp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, mode="wt", encoding="utf-8") as fp:
+                fp.write(contents)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save the {self.description}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
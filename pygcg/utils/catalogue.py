@@ -0,0 +1,139 @@
+import hashlib
+import os
+from pathlib import Path
+
+import astropy.io.fits as pf
+from astropy.table import QTable
+
+# The catalogue columns used by pyGCG, and their default names.
+CATALOGUE_KEYS = {
+    "id": "NUMBER",
+    "seg_id": None,
+    "ra": "X_WORLD",
+    "dec": "Y_WORLD",
+    "mag": "MAG_AUTO",
+    "radius": "KRON_RCIRC",
+    "zspec": "zspec",
+    "zphot": "zphot",
+    "z_vals": "",
+    "z_flags": "",
+}
+
+
+def catalogue_columns(cat_config):
+    """
+    Find the names of all catalogue columns used by pyGCG.
+
+    Parameters
+    ----------
+    cat_config : dict
+        The ``[catalogue]`` table of the configuration file.
+
+    Returns
+    -------
+    list of str
+        The column names, without duplicates.
+    """
+    names = []
+    for key, default in CATALOGUE_KEYS.items():
+        if key == "seg_id":
+            default = cat_config.get("id", CATALOGUE_KEYS["id"])
+        name = cat_config.get(key, default)
+        if isinstance(name, str) and len(name) > 0 and name not in names:
+            names.append(name)
+    return names
+
+
+def _project_fits(path, columns):
+    with pf.open(path, memmap=True) as hdul:
+        for hdu in hdul:
+            if isinstance(hdu, pf.BinTableHDU):
+                break
+        else:
+            raise ValueError(f"No table found in {path}.")
+        # Only the requested columns are copied out of the memory-mapped
+        # file, before astropy parses units and masks
+        names = [c for c in hdu.columns.names if c in columns]
+        projected = pf.BinTableHDU.from_columns(
+            [
+                pf.Column(
+                    name=c.name,
+                    format=c.format,
+                    unit=c.unit,
+                    null=c.null,
+                    bscale=c.bscale,
+                    bzero=c.bzero,
+                    dim=c.dim,
+                    array=hdu.data.field(c.name),
+                )
+                for c in [hdu.columns[n] for n in names]
+            ]
+        )
+    return QTable.read(projected)
+
+
+def read_catalogue(path, columns=None, cache_dir=None):
+    """
+    Read only the requested columns of a catalogue.
+
+    FITS catalogues are read through a memory map, so that unused columns
+    are never loaded. If ``cache_dir`` is supplied, the projected catalogue
+    is stored there, and reused until the source catalogue or the requested
+    columns change.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of the input catalogue.
+    columns : list of str, optional
+        The columns to read. Any which are not present in the catalogue are
+        ignored. By default, all columns are read.
+    cache_dir : str or os.PathLike, optional
+        The directory in which the projected catalogue is cached.
+
+    Returns
+    -------
+    astropy.table.QTable
+        The catalogue.
+    """
+    path = Path(path)
+    stat = os.stat(path)
+    cols_key = ";".join(columns) if columns is not None else ""
+
+    cache_path = None
+    if cache_dir is not None:
+        path_hash = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:8]
+        cache_path = Path(cache_dir) / f"{path.stem}_{path_hash}.cat.fits"
+        try:
+            cat = QTable.read(cache_path)
+            assert cat.meta["CATMTIME"] == str(stat.st_mtime_ns)
+            assert cat.meta["CATSIZE"] == stat.st_size
+            assert cat.meta["CATCOLS"] == cols_key
+            for k in ["CATMTIME", "CATSIZE", "CATCOLS"]:
+                del cat.meta[k]
+            return cat
+        except Exception as e:
+            pass
+
+    if columns is None:
+        cat = QTable.read(path)
+    else:
+        try:
+            cat = _project_fits(path, columns)
+        except Exception as e:
+            # Not a FITS binary table, so the full catalogue is read instead
+            cat = QTable.read(path)
+            cat.keep_columns([c for c in cat.colnames if c in columns])
+
+    if cache_path is not None:
+        cached = cat.copy(copy_data=False)
+        cached.meta["CATMTIME"] = str(stat.st_mtime_ns)
+        cached.meta["CATSIZE"] = stat.st_size
+        cached.meta["CATCOLS"] = cols_key
+        try:
+            cache_path.parent.mkdir(exist_ok=True, parents=True)
+            cached.write(cache_path, overwrite=True)
+        except Exception as e:
+            print(f"Could not cache the catalogue: {e}")
+
+    return cat
@@ -0,0 +1,233 @@
+import sqlite3
+import time
+
+import astropy.units as u
+import numpy as np
+from astropy.table import MaskedColumn, QTable, Table
+
+# The table in which classifications are stored.
+TABLE_NAME = "classifications"
+
+# The journal modes which can be used. Only WAL requires all processes to be
+# on the same machine.
+JOURNAL_MODES = ["DELETE", "TRUNCATE", "PERSIST", "WAL"]
+
+
+def _sql_type(dtype):
+    if dtype.kind in "iub":
+        return "INTEGER"
+    elif dtype.kind == "f":
+        return "REAL"
+    else:
+        return "TEXT"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class ClassificationDatabase:
+    """
+    An SQLite database of classifications, which can be shared by several
+    annotators.
+
+    Each annotator has at most one row per object, with the primary key
+    ``(SEG_ID, ANNOTATOR)``. Multiple ``pyGCG`` processes can read and write
+    at the same time, with SQLite's file locks preventing conflicting writes.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the database, which is created if necessary.
+    template : astropy.table.QTable
+        An (empty) output catalogue, used to define the columns and units.
+    annotator : str
+        The name attached to any classifications saved.
+    timeout : float, optional
+        The time in seconds to wait if another process is writing, by default
+        30.
+    journal_mode : str, optional
+        The SQLite journal mode, by default ``"delete"`` (a rollback
+        journal), which is safe on network filesystems with working file
+        locks. ``"wal"`` (write-ahead logging) allows reads during writes,
+        but relies on shared memory, and so requires every process to run
+        on the same machine. ``"truncate"`` and ``"persist"`` are also
+        accepted.
+    """
+
+    def __init__(self, path, template, annotator, timeout=30.0, journal_mode="delete"):
+        self.path = path
+        self.annotator = str(annotator)
+        self.template = template[:0].copy()
+        self.colnames = list(self.template.colnames)
+
+        journal_mode = str(journal_mode).upper()
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(
+                f"Unknown SQLite journal mode '{journal_mode.lower()}'. Use one "
+                f"of {', '.join(m.lower() for m in JOURNAL_MODES)}."
+            )
+
+        self.connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        # Without a write-ahead log, every commit must be synced to disk to
+        # avoid corruption
+        self.connection.execute(
+            f"PRAGMA synchronous={'NORMAL' if journal_mode == 'WAL' else 'FULL'}"
+        )
+
+        columns = [
+            f"{_quote(n)} {_sql_type(self.template[n].dtype)}" for n in self.colnames
+        ]
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ("
+            + ", ".join(
+                columns
+                + [
+                    "ANNOTATOR TEXT NOT NULL",
+                    "UPDATED REAL",
+                    "PRIMARY KEY (SEG_ID, ANNOTATOR)",
+                ]
+            )
+            + ")"
+        )
+        # New columns may be added if the grisms or position angles change
+        existing = {
+            r[1] for r in self.connection.execute(f"PRAGMA table_info({TABLE_NAME})")
+        }
+        for n, c in zip(self.colnames, columns):
+            if n not in existing:
+                self.connection.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {c}")
+
+        all_cols = self.colnames + ["ANNOTATOR", "UPDATED"]
+        self._upsert_sql = (
+            f"INSERT INTO {TABLE_NAME} ({', '.join(_quote(n) for n in all_cols)}) "
+            f"VALUES ({', '.join('?' * len(all_cols))}) "
+            "ON CONFLICT (SEG_ID, ANNOTATOR) DO UPDATE SET "
+            + ", ".join(
+                f"{_quote(n)}=excluded.{_quote(n)}"
+                for n in all_cols
+                if n not in ["SEG_ID", "ANNOTATOR"]
+            )
+        )
+
+    def _to_sql(self, name, value):
+        if value is None or value is np.ma.masked:
+            return None
+        unit = getattr(self.template[name], "unit", None)
+        if isinstance(value, u.Quantity):
+            value = value.to_value(unit) if unit is not None else value.value
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value
+
+    def upsert(self, record):
+        """
+        Insert or update a single classification.
+
+        Parameters
+        ----------
+        record : dict
+            The flattened classification, as stored in the output catalogue.
+        """
+        self.connection.execute(
+            self._upsert_sql,
+            [self._to_sql(n, record.get(n)) for n in self.colnames]
+            + [self.annotator, time.time()],
+        )
+
+    def read(self, annotator=False):
+        """
+        Read classifications from the database.
+
+        Parameters
+        ----------
+        annotator : str or None, optional
+            Only return the classifications of this annotator. By default,
+            the current annotator is used. If ``None``, all classifications
+            are returned, with an additional ``ANNOTATOR`` column.
+
+        Returns
+        -------
+        astropy.table.QTable
+            The classifications, with the same columns as ``template``.
+        """
+        if annotator is False:
+            annotator = self.annotator
+        names = self.colnames + (["ANNOTATOR"] if annotator is None else [])
+        query = f"SELECT {', '.join(_quote(n) for n in names)} FROM {TABLE_NAME}"
+        if annotator is None:
+            rows = self.connection.execute(query + " ORDER BY SEG_ID").fetchall()
+        else:
+            rows = self.connection.execute(
+                query + " WHERE ANNOTATOR=? ORDER BY rowid", (str(annotator),)
+            ).fetchall()
+
+        out_cat = self.template.copy()
+        if annotator is None:
+            out_cat["ANNOTATOR"] = np.array([], dtype=str)
+        if len(rows) == 0:
+            return out_cat
+
+        columns = list(zip(*rows))
+        new_cat = QTable()
+        for n, values in zip(names, columns):
+            mask = np.array([v is None for v in values])
+            kind = out_cat[n].dtype.kind
+            fill = "" if kind in "USO" else 0
+            data = np.array([fill if v is None else v for v in values])
+            if kind == "b":
+                data = data.astype(bool)
+            elif kind in "iuf":
+                data = data.astype(out_cat[n].dtype)
+            else:
+                data = data.astype(str)
+            if np.any(mask):
+                data = MaskedColumn(data, mask=mask)
+            unit = getattr(out_cat[n], "unit", None)
+            new_cat[n] = data * unit if unit is not None else data
+        return new_cat
+
+    def close(self):
+        self.connection.close()
+
+
+def read_database(path):
+    """
+    Read every classification in a database, without a template.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the database.
+
+    Returns
+    -------
+    astropy.table.Table
+        All classifications, including the ``ANNOTATOR`` and ``UPDATED``
+        columns.
+    """
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.execute(f"SELECT * FROM {TABLE_NAME} ORDER BY SEG_ID")
+        names = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        connection.close()
+
+    tab = Table()
+    for n, values in zip(names, zip(*rows) if len(rows) > 0 else [()] * len(names)):
+        mask = np.array([v is None for v in values], dtype=bool)
+        present = [v for v in values if v is not None]
+        fill = present[0] if len(present) > 0 else ""
+        if isinstance(fill, str):
+            fill = ""
+        else:
+            fill = type(fill)(0)
+        data = np.array([fill if v is None else v for v in values])
+        tab[n] = MaskedColumn(data, mask=mask) if np.any(mask) else data
+    return tab
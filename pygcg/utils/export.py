@@ -0,0 +1,463 @@
+import io
+from pathlib import Path
+
+import astropy.io.fits as pf
+import numpy as np
+from astropy.io import ascii
+from astropy.table import MaskedColumn, Table
+
+# The output formats which can be written incrementally.
+EXPORT_FORMATS = {
+    ".fits": "fits",
+    ".fit": "fits",
+    ".csv": "ascii.csv",
+    ".ecsv": "ascii.ecsv",
+}
+
+
+def iter_catalogue_chunks(path, chunk_rows=100000):
+    """
+    Read a catalogue in chunks of rows.
+
+    FITS tables are memory-mapped, and CSV files are parsed incrementally,
+    so that only one chunk is held in memory at a time. Other formats are
+    read in full, and then split into chunks.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the catalogue.
+    chunk_rows : int, optional
+        The maximum number of rows in each chunk, by default 100000.
+
+    Yields
+    ------
+    astropy.table.Table
+        Consecutive chunks of the catalogue.
+    """
+    path = Path(path)
+    if path.suffix.lower() in [".fits", ".fit"]:
+        with pf.open(path, memmap=True) as hdul:
+            for hdu in hdul:
+                if isinstance(hdu, pf.BinTableHDU):
+                    break
+            else:
+                raise ValueError(f"No table found in {path}.")
+            for start in range(0, max(hdu.header["NAXIS2"], 1), chunk_rows):
+                # Only the rows in this chunk are copied out of the file
+                chunk_hdu = pf.BinTableHDU(
+                    data=hdu.data[start : start + chunk_rows], header=hdu.header
+                )
+                yield Table.read(chunk_hdu)
+    elif path.suffix.lower() == ".csv":
+        # The fast reader splits by bytes, so the chunk size is approximate
+        with open(path, mode="rb") as fp:
+            line_length = max(len(fp.readline()), len(fp.readline()), 1)
+        yield from ascii.read(
+            path,
+            format="csv",
+            guess=False,
+            fast_reader={
+                "chunk_size": max(line_length * chunk_rows, 1 << 20),
+                "chunk_generator": True,
+            },
+        )
+    else:
+        tab = Table.read(path)
+        for start in range(0, max(len(tab), 1), chunk_rows):
+            yield tab[start : start + chunk_rows]
+
+
+def _str_width(dtype):
+    # The number of characters needed to hold any value of this type
+    if dtype.kind in "US":
+        return dtype.itemsize // (4 if dtype.kind == "U" else 1)
+    return np.zeros(1, dtype=dtype).astype(str).dtype.itemsize // 4
+
+
+def _merge_dtypes(dtype, other):
+    # The narrowest type which can hold the values of both types
+    if dtype is None or dtype == other:
+        return other
+    if dtype.kind in "US" or other.kind in "US":
+        kind = "S" if dtype.kind == other.kind == "S" else "U"
+        return np.dtype(f"{kind}{max(_str_width(dtype), _str_width(other))}")
+    return np.result_type(dtype, other)
+
+
+def catalogue_template(path, chunk_rows=100000):
+    """
+    Find the columns of a catalogue, and the type of each.
+
+    For FITS tables, these are read from the header. For other formats, the
+    whole catalogue is read one chunk at a time, and the types found in
+    each chunk are combined. For example, a CSV column with only integers in
+    the first chunk, and decimals in a later one, is given a floating point
+    type, and string columns are wide enough for the longest value.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the catalogue.
+    chunk_rows : int, optional
+        The maximum number of rows read at once, by default 100000.
+
+    Returns
+    -------
+    astropy.table.Table
+        An empty table with the same columns as the catalogue. Columns with
+        missing values (or, for FITS tables, a null value) are masked.
+    """
+    path = Path(path)
+    if path.suffix.lower() in [".fits", ".fit"]:
+        with pf.open(path, memmap=True) as hdul:
+            for hdu in hdul:
+                if isinstance(hdu, pf.BinTableHDU):
+                    break
+            else:
+                raise ValueError(f"No table found in {path}.")
+            template = Table.read(pf.BinTableHDU(data=hdu.data[:0], header=hdu.header))
+            for col in hdu.columns:
+                if col.null is not None and not isinstance(
+                    template[col.name], MaskedColumn
+                ):
+                    template[col.name] = MaskedColumn(
+                        template[col.name], fill_value=col.null
+                    )
+        return template
+
+    first = None
+    dtypes = {}
+    masked = set()
+    for chunk in iter_catalogue_chunks(path, chunk_rows=chunk_rows):
+        if first is None:
+            first = chunk[:0]
+        for name in chunk.colnames:
+            dtypes[name] = _merge_dtypes(dtypes.get(name), chunk[name].dtype)
+            if np.ma.is_masked(chunk[name]):
+                masked.add(name)
+    if first is None:
+        raise ValueError(f"No rows found in {path}.")
+
+    template = Table(first, copy=True)
+    for name in template.colnames:
+        col = template[name].astype(dtypes[name])
+        if name in masked and not isinstance(col, MaskedColumn):
+            col = MaskedColumn(col)
+        template[name] = col
+    return template
+
+
+def _conform_column(name, col, dtype):
+    # Columns are only converted if no information is lost
+    if col.dtype == dtype:
+        return col
+    if dtype.kind in "US":
+        text = col if col.dtype.kind in "US" else col.astype(str)
+        if (
+            _str_width(text.dtype) > _str_width(dtype)
+            and len(text) > 0
+            and np.max(np.char.str_len(np.ma.getdata(text))) > _str_width(dtype)
+        ):
+            raise ValueError(
+                f"Column {name} contains strings longer than the "
+                f"{_str_width(dtype)} characters allowed by the first chunk or "
+                "template."
+            )
+        return text.astype(dtype)
+    if np.can_cast(col.dtype, dtype, casting="safe"):
+        return col.astype(dtype)
+    raise ValueError(
+        f"Column {name} has type {col.dtype}, which cannot be written to a "
+        f"column of type {dtype} without losing information."
+    )
+
+
+class ChunkedTableWriter:
+    """
+    Write a table to disk one chunk of rows at a time.
+
+    The columns are defined by ``template`` if given, and otherwise by the
+    first chunk written. Every chunk is converted to these types if this
+    loses no information (e.g. integers written to a floating point column,
+    or shorter strings), and a `ValueError` is raised otherwise. For FITS
+    files, the header is written with a placeholder row count, which is
+    updated when the writer is closed.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The output location. The format (FITS, CSV or ECSV) is set by the
+        suffix.
+    template : astropy.table.Table, optional
+        An (empty) table, used to define the columns and types. Masked
+        integer columns are always given a null value in FITS output, even
+        if no values are missing in the first chunk.
+    """
+
+    def __init__(self, path, template=None):
+        self.path = Path(path)
+        try:
+            self.format = EXPORT_FORMATS[self.path.suffix.lower()]
+        except KeyError:
+            raise ValueError(
+                f"Cannot export to {self.path.name}. The suffix must be one "
+                f"of {', '.join(EXPORT_FORMATS)}."
+            )
+        self.fp = open(self.path, mode="wb" if self.format == "fits" else "wt")
+        self.n_rows = 0
+        self.header = None
+        self.template = None
+        if template is not None:
+            self._start(template)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self, template):
+        # The header is written before any rows
+        self.template = Table(template[:0], copy=True)
+        if self.format != "fits":
+            self.template.write(self.fp, format=self.format)
+            return
+        template = Table(self.template, copy=True)
+        for name in template.colnames:
+            col = template[name]
+            if not isinstance(col, MaskedColumn):
+                continue
+            if col.dtype.kind == "b":
+                # FITS has no null value for logical columns
+                template[name] = col.filled(False)
+            elif col.dtype.kind == "i" and col.fill_value == np.ma.default_fill_value(
+                col.dtype
+            ):
+                # Less likely to clash with a real value than the default
+                col.fill_value = np.iinfo(col.dtype).min
+        hdu = pf.table_to_hdu(template)
+        self.header = hdu.header
+        self.columns = hdu.columns
+        pf.PrimaryHDU().writeto(self.fp)
+        self.header_start = self.fp.tell()
+        self.fp.write(self.header.tostring().encode("ascii"))
+
+    def _conform(self, chunk):
+        missing = [n for n in self.template.colnames if n not in chunk.colnames]
+        if len(missing) > 0:
+            raise ValueError(f"Columns missing from chunk: {', '.join(missing)}.")
+        conformed = Table(
+            [
+                _conform_column(n, chunk[n], self.template[n].dtype)
+                for n in self.template.colnames
+            ],
+            names=self.template.colnames,
+            copy=False,
+        )
+        return conformed
+
+    def write(self, chunk):
+        """
+        Append a chunk of rows to the output.
+
+        Parameters
+        ----------
+        chunk : astropy.table.Table
+            The rows to write, with the same columns as the template or first
+            chunk.
+
+        Raises
+        ------
+        ValueError
+            If a column cannot be converted to the type of the template
+            without losing information.
+        """
+        if self.template is None:
+            self._start(chunk)
+        chunk = self._conform(chunk)
+        if self.format == "fits":
+            self._write_fits(chunk)
+        else:
+            chunk.write(
+                self.fp,
+                format="ascii.no_header",
+                delimiter="," if self.format == "ascii.csv" else " ",
+            )
+        self.n_rows += len(chunk)
+
+    def _write_fits(self, chunk):
+        # Masked values are filled using the null values of the header, so
+        # that all rows share the same column definitions
+        columns = []
+        for ref in self.columns:
+            col = chunk[ref.name]
+            if np.ma.is_masked(col):
+                kind = col.dtype.kind
+                if kind == "f":
+                    fill = np.nan
+                elif kind in "USO":
+                    fill = ""
+                elif kind == "b":
+                    fill = False
+                elif ref.null is None:
+                    raise ValueError(
+                        f"Column {ref.name} has missing values, but no null "
+                        "value is defined by the first chunk or template."
+                    )
+                else:
+                    fill = ref.null
+                col = col.filled(fill)
+            columns.append(
+                pf.Column(
+                    name=ref.name,
+                    format=ref.format,
+                    unit=ref.unit,
+                    null=ref.null,
+                    dim=ref.dim,
+                    array=np.asarray(col),
+                )
+            )
+        hdu = pf.BinTableHDU.from_columns(columns)
+        buffer = io.BytesIO()
+        hdu.writeto(buffer)
+        # Skip the primary and table headers, and the final padding
+        data_start = 2880 + len(hdu.header.tostring())
+        data_size = hdu.header["NAXIS1"] * hdu.header["NAXIS2"]
+        self.fp.write(buffer.getbuffer()[data_start : data_start + data_size])
+
+    def close(self):
+        """
+        Finish writing the output.
+        """
+        if self.fp.closed:
+            return
+        if self.format == "fits" and self.header is not None:
+            data_size = self.header["NAXIS1"] * self.n_rows
+            self.fp.write(b"\0" * (-data_size % 2880))
+            self.header["NAXIS2"] = self.n_rows
+            self.fp.seek(self.header_start)
+            self.fp.write(self.header.tostring().encode("ascii"))
+        self.fp.close()
+
+
+def join_classifications(chunk, classifications, seg_id_col, order=None):
+    """
+    Join a chunk of the input catalogue to the classifications.
+
+    Parameters
+    ----------
+    chunk : astropy.table.Table
+        Rows of the input catalogue.
+    classifications : astropy.table.Table
+        The output catalogue of `pyGCG`, with one row per ``SEG_ID``.
+    seg_id_col : str
+        The name of the segmentation ID column in ``chunk``.
+    order : array-like, optional
+        The indices which sort ``classifications`` by ``SEG_ID``. These are
+        calculated if not supplied.
+
+    Returns
+    -------
+    astropy.table.Table
+        The input rows, with all columns from the classifications
+        (excluding ``SEG_ID``), and a boolean ``CLASSIFIED`` column. Names
+        already used in the input catalogue are prefixed by ``GCG_``.
+        Columns are masked for objects which were not classified.
+    """
+    cls_ids = np.asarray(classifications["SEG_ID"]).astype(int)
+    if order is None:
+        order = np.argsort(cls_ids, kind="stable")
+    sorted_ids = cls_ids[order]
+
+    seg_ids = np.asarray(np.ma.filled(chunk[seg_id_col], -1)).astype(int)
+    pos = np.searchsorted(sorted_ids, seg_ids, side="right") - 1
+    pos = np.clip(pos, 0, None)
+    matched = (
+        sorted_ids[pos] == seg_ids
+        if len(sorted_ids) > 0
+        else np.zeros(len(seg_ids), dtype=bool)
+    )
+    rows = order[pos] if len(sorted_ids) > 0 else pos
+
+    joined = Table(chunk, copy=False)
+    for name in ["CLASSIFIED"] + list(classifications.colnames):
+        if name == "SEG_ID":
+            continue
+        out_name = f"GCG_{name}" if name in chunk.colnames else name
+        if name == "CLASSIFIED":
+            joined[out_name] = matched
+            continue
+        col = classifications[name]
+        if len(col) > 0:
+            data = np.asarray(np.ma.getdata(col))[rows]
+            mask = ~matched | np.ma.getmaskarray(col)[rows]
+        else:
+            data = np.zeros(len(chunk), dtype=col.dtype)
+            mask = np.ones(len(chunk), dtype=bool)
+        joined[out_name] = MaskedColumn(
+            data, mask=mask, unit=getattr(col, "unit", None)
+        )
+    return joined
+
+
+def export_catalogue(
+    cat_path, classifications, out_path, seg_id_col, chunk_rows=100000
+):
+    """
+    Join the classifications to the full input catalogue, and write the
+    result to disk.
+
+    The input catalogue is read, joined and written in chunks of rows, so
+    that the memory used does not depend on the length of the catalogue.
+    Catalogues other than FITS tables are read twice, first to find the
+    type of each column (see `catalogue_template`).
+
+    Parameters
+    ----------
+    cat_path : str or os.PathLike
+        The input catalogue.
+    classifications : astropy.table.Table
+        The classifications, with one row per ``SEG_ID``. If a ``SEG_ID`` is
+        repeated, the last row is used.
+    out_path : str or os.PathLike
+        The output location. The format (FITS, CSV or ECSV) is set by the
+        suffix.
+    seg_id_col : str
+        The name of the segmentation ID column in the input catalogue.
+    chunk_rows : int, optional
+        The number of rows processed at once, by default 100000.
+
+    Returns
+    -------
+    tuple of int
+        The number of rows written, and the number of these which have been
+        classified.
+    """
+    classifications = Table(classifications, copy=False)
+    cls_ids = np.asarray(classifications["SEG_ID"]).astype(int)
+    # Reverse before sorting, so that the last duplicate is found first
+    rev = np.arange(len(cls_ids))[::-1]
+    _, keep = np.unique(cls_ids[rev], return_index=True)
+    classifications = classifications[np.sort(rev[keep])]
+    order = np.argsort(np.asarray(classifications["SEG_ID"]).astype(int))
+
+    # The types of every column are fixed before any rows are written
+    template = join_classifications(
+        catalogue_template(cat_path, chunk_rows=chunk_rows),
+        classifications,
+        seg_id_col,
+        order=order,
+    )
+
+    n_rows = 0
+    n_classified = 0
+    with ChunkedTableWriter(out_path, template=template) as writer:
+        for chunk in iter_catalogue_chunks(cat_path, chunk_rows=chunk_rows):
+            joined = join_classifications(
+                chunk, classifications, seg_id_col, order=order
+            )
+            writer.write(joined)
+            n_rows += len(joined)
+            n_classified += int(np.sum(joined["CLASSIFIED"]))
+    return n_rows, n_classified
@@ -0,0 +1,94 @@
+from .offsets import scan_hdu_offsets
+
+# The extensions of a grizli stack file which are recorded in the index.
+STACK_EXTNAMES = ["SCI", "CONTAM", "MODEL", "WHT", "KERNEL"]
+
+
+def stack_metadata(hdus):
+    """
+    Describe the contents of a grizli stack file from its HDU index.
+
+    Parameters
+    ----------
+    hdus : list of list
+        The output of `scan_hdu_offsets` for the stack file.
+
+    Returns
+    -------
+    dict
+        A dictionary containing the number of grisms (``"NGRISM"``), the
+        number of position angles for each grism (``"N_PA"``), and the
+        available extensions (``"EXT"``). The latter is a nested dictionary
+        of ``{extname: {extver: {"shape": [ny, nx], "wmin": ..., "wmax":
+        ...}}}``.
+    """
+    primary = hdus[0][5] if len(hdus) > 0 else {}
+    n_grism = int(primary.get("NGRISM", 0))
+    n_pa = {}
+    for n in range(1, n_grism + 1):
+        grism = primary.get(f"GRISM{n:0>3}")
+        if grism is not None:
+            n_pa[grism] = int(primary.get(f"N{grism}", 0))
+
+    extensions = {}
+    for name, ver, _, _, _, keywords in hdus[1:]:
+        if name not in STACK_EXTNAMES:
+            continue
+        # If an extension is repeated, the first is used
+        extensions.setdefault(name, {}).setdefault(
+            ver,
+            {
+                "shape": [keywords.get("NAXIS2", 0), keywords.get("NAXIS1", 0)],
+                "wmin": keywords.get("WMIN"),
+                "wmax": keywords.get("WMAX"),
+            },
+        )
+
+    return {"NGRISM": n_grism, "N_PA": n_pa, "EXT": extensions}
+
+
+def read_stack_metadata(path):
+    """
+    Read the header metadata of a grizli stack file.
+
+    Only the headers are parsed, and no data arrays are loaded.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of the ``*.stack.fits`` (or ``*.spec2D.fits``) file.
+
+    Returns
+    -------
+    dict
+        The output of `stack_metadata`.
+    """
+    return stack_metadata(scan_hdu_offsets(path))
+
+
+def has_extension(meta, ext, extver):
+    """
+    Check whether a stack file contains a given extension.
+
+    Parameters
+    ----------
+    meta : dict or None
+        The output of `read_stack_metadata`.
+    ext : str
+        The extension name. ``"RESIDUALS"`` requires both ``"SCI"`` and
+        ``"MODEL"``.
+    extver : str
+        The extension version, e.g. ``"F150W,72.0"``.
+
+    Returns
+    -------
+    bool or None
+        ``None`` if ``meta`` is not available.
+    """
+    if meta is None:
+        return None
+    if ext == "RESIDUALS":
+        return has_extension(meta, "SCI", extver) and has_extension(
+            meta, "MODEL", extver
+        )
+    return extver in meta["EXT"].get(ext, {})
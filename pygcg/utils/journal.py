@@ -0,0 +1,259 @@
+import json
+import os
+
+import astropy.units as u
+import numpy as np
+
+
+def _encode(value):
+    if value is np.ma.masked or (np.ma.isMaskedArray(value) and np.all(value.mask)):
+        return None
+    if isinstance(value, u.Quantity):
+        return {"value": _encode(value.value), "unit": value.unit.to_string()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and "unit" in value:
+        return value["value"] * u.Unit(value["unit"])
+    return value
+
+
+class ClassificationJournal:
+    """
+    An append-only record of the classifications saved in a session.
+
+    Each save is written as a single line of JSON, and flushed to disk
+    before returning, so that at most the record being written is lost if
+    ``pyGCG`` exits unexpectedly. The journal is periodically compacted into
+    the output catalogue, and any records which were not compacted are
+    replayed when the catalogue is next loaded.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.n_records = 0
+        # The number of bytes removed from the start of the journal, so that
+        # offsets remain valid after truncation
+        self.base = 0
+
+    def append(self, record):
+        """
+        Append a single classification to the journal.
+
+        Parameters
+        ----------
+        record : dict
+            The flattened classification, as stored in the output catalogue.
+        """
+        line = json.dumps({k: _encode(v) for k, v in record.items()}) + "\n"
+        with open(self.path, mode="at", encoding="utf-8") as fp:
+            fp.write(line)
+            fp.flush()
+            os.fsync(fp.fileno())
+        self.n_records += 1
+
+    def read(self):
+        """
+        Read all complete records in the journal.
+
+        Returns
+        -------
+        list of dict
+            The records, in the order they were written. A final, partially
+            written line is ignored.
+        """
+        records = []
+        self.valid_size = 0
+        try:
+            with open(self.path, mode="rb") as fp:
+                for line in fp:
+                    try:
+                        assert line.endswith(b"\n")
+                        records.append(
+                            {
+                                k: _decode(v)
+                                for k, v in json.loads(line.decode("utf-8")).items()
+                            }
+                        )
+                    except (AssertionError, ValueError):
+                        break
+                    self.valid_size += len(line)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def replay(self, out_cat, encode=None):
+        """
+        Apply the records in the journal to the output catalogue.
+
+        Later records replace earlier ones with the same ``SEG_ID``.
+
+        Parameters
+        ----------
+        out_cat : astropy.table.QTable
+            The output catalogue, which is modified in place.
+        encode : callable, optional
+            Applied to each record before it is added to the catalogue, for
+            example to convert records written by an earlier version.
+
+        Returns
+        -------
+        int
+            The number of records applied.
+        """
+        records = self.read()
+        if self.size() - self.base > self.valid_size:
+            # Remove an incomplete record, so that new records are not
+            # appended to the same line
+            os.truncate(self.path, self.valid_size)
+        row_index = index_rows(out_cat)
+        for record in records:
+            if encode is not None:
+                record = encode(record)
+            update_record(out_cat, row_index, record)
+        self.n_records = len(records)
+        return len(records)
+
+    def size(self):
+        """
+        The current length of the journal in bytes.
+
+        This includes any records which have already been removed by
+        `truncate`, and so can be used to mark a position in the journal.
+        """
+        try:
+            return self.base + os.path.getsize(self.path)
+        except OSError:
+            return self.base
+
+    def truncate(self, offset=None):
+        """
+        Remove records, after they have been written to the catalogue.
+
+        Parameters
+        ----------
+        offset : int, optional
+            Only remove the records before this position (as returned by
+            `size`), keeping any which were appended afterwards. By default,
+            all records are removed.
+        """
+        if offset is None:
+            offset = self.size()
+        remainder = b""
+        try:
+            with open(self.path, mode="rb") as fp:
+                fp.seek(offset - self.base)
+                remainder = fp.read()
+        except FileNotFoundError:
+            pass
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, mode="wb") as fp:
+            fp.write(remainder)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, self.path)
+        self.base = offset
+        self.n_records = remainder.count(b"\n")
+
+
+def add_record(out_cat, record):
+    """
+    Add a classification to the output catalogue.
+
+    Parameters
+    ----------
+    out_cat : astropy.table.QTable
+        The output catalogue, which is modified in place.
+    record : dict
+        The flattened classification. Values of ``None`` are masked.
+    """
+    vals = {}
+    mask = {}
+    for k in out_cat.colnames:
+        v = record.get(k)
+        mask[k] = v is None
+        if v is None:
+            v = np.zeros((), dtype=out_cat[k].dtype)[()]
+            if getattr(out_cat[k], "unit", None) is not None:
+                v = v * out_cat[k].unit
+        vals[k] = v
+    if any(mask.values()):
+        out_cat.add_row(vals, mask=mask)
+    else:
+        out_cat.add_row(vals)
+
+
+def index_rows(out_cat):
+    """
+    Map each ``SEG_ID`` in the output catalogue to its row.
+
+    Parameters
+    ----------
+    out_cat : astropy.table.QTable
+        The output catalogue.
+
+    Returns
+    -------
+    dict
+        The row index of each ``SEG_ID``. If a ``SEG_ID`` is repeated, the
+        last row is used.
+    """
+    return {int(s): i for i, s in enumerate(np.asarray(out_cat["SEG_ID"]))}
+
+
+def update_record(out_cat, row_index, record):
+    """
+    Add or replace a classification in the output catalogue.
+
+    Existing rows are updated in place, using ``row_index`` to find them.
+
+    Parameters
+    ----------
+    out_cat : astropy.table.QTable
+        The output catalogue, which is modified in place.
+    row_index : dict
+        The output of `index_rows`, which is kept up to date.
+    record : dict
+        The flattened classification. Values of ``None`` are masked.
+    """
+    seg_id = int(record["SEG_ID"])
+    if seg_id not in row_index:
+        add_record(out_cat, record)
+        row_index[seg_id] = len(out_cat) - 1
+        return
+
+    idx = row_index[seg_id]
+    if any(record.get(k) is None for k in out_cat.colnames):
+        # Masking a single value may need the column to be converted, so the
+        # row is replaced instead
+        out_cat.remove_row(idx)
+        add_record(out_cat, record)
+        row_index.clear()
+        row_index.update(index_rows(out_cat))
+        return
+
+    for k in out_cat.colnames:
+        v = record[k]
+        kind = out_cat[k].dtype.kind
+        if kind in "US":
+            # Widen string columns, rather than truncating the new value.
+            # Catalogues read from FITS store strings as UTF-8 bytes
+            if kind == "U":
+                width, itemsize = len(str(v)), out_cat[k].dtype.itemsize // 4
+            else:
+                width, itemsize = len(str(v).encode("utf-8")), out_cat[k].dtype.itemsize
+            if width > itemsize:
+                out_cat.replace_column(k, out_cat[k].astype(f"{kind}{width}"))
+        out_cat[k][idx] = v
@@ -0,0 +1,162 @@
+from pathlib import Path
+
+import numpy as np
+from astropy.table import Table, vstack
+
+from pygcg.utils.schema import FLAG_BITS, QUALITY_LEVELS, encode_quality
+
+
+def read_classifications(path):
+    """
+    Read the classifications from a pyGCG output file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        Either an output catalogue (FITS, ECSV, ...), or an SQLite database.
+
+    Returns
+    -------
+    astropy.table.Table
+        The classifications, with an ``ANNOTATOR`` column. For catalogues,
+        this is taken from the file name.
+    """
+    path = Path(path)
+    if path.suffix in [".sqlite", ".db"]:
+        from pygcg.utils.database import read_database
+
+        return read_database(path)
+
+    tab = Table.read(path)
+    for name in tab.colnames:
+        # Units are not needed to merge, and may not be consistent
+        tab[name].unit = None
+    if "ANNOTATOR" not in tab.colnames:
+        tab["ANNOTATOR"] = np.full(len(tab), path.stem)
+    return tab
+
+
+def _group_mean(values, inv, n_groups):
+    valid = np.isfinite(values)
+    counts = np.bincount(inv[valid], minlength=n_groups)
+    sums = np.bincount(inv[valid], weights=values[valid], minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts, counts
+
+
+def merge_classifications(tables, z_tolerance=0.05):
+    """
+    Combine the classifications of multiple annotators.
+
+    All operations are vectorised over objects, by grouping the stacked
+    classifications on ``SEG_ID``.
+
+    Parameters
+    ----------
+    tables : list of astropy.table.Table
+        The classifications, as returned by `read_classifications`. If a
+        table has no ``ANNOTATOR`` column, its position in the list is used.
+    z_tolerance : float, optional
+        Objects are flagged if the estimated redshifts differ by more than
+        ``z_tolerance * (1 + z)``, by default 0.05.
+
+    Returns
+    -------
+    astropy.table.Table
+        One row per object, containing the number of annotators, the
+        consensus quality code of each beam (the most common value, with
+        ties resolved towards the worse quality), the fraction of annotators
+        agreeing with it, disagreement flags, and statistics of the
+        estimated redshift.
+    """
+    tables = [t.copy(copy_data=False) for t in tables]
+    for i, t in enumerate(tables):
+        if "ANNOTATOR" not in t.colnames:
+            t["ANNOTATOR"] = np.full(len(t), str(i))
+        # Older catalogues store the qualities as names
+        for name in [n for n in t.colnames if n.endswith("_QUALITY")]:
+            t[name] = encode_quality(t[name])
+    stacked = vstack(tables, join_type="outer", metadata_conflicts="silent")
+    seg_ids = np.asarray(stacked["SEG_ID"], dtype=int)
+    uniq, first, inv = np.unique(seg_ids, return_index=True, return_inverse=True)
+    n_obj = len(uniq)
+
+    merged = Table()
+    merged["SEG_ID"] = uniq
+    for name in ["ID", "RA", "DEC", "GRIZLI_REDSHIFT"]:
+        if name in stacked.colnames:
+            merged[name] = np.asarray(stacked[name])[first]
+    merged["N_ANNOTATORS"] = np.bincount(inv, minlength=n_obj)
+
+    order = np.argsort(inv, kind="stable")
+    bounds = np.searchsorted(inv[order], np.arange(n_obj + 1))
+    annotators = np.asarray(stacked["ANNOTATOR"]).astype(str)[order]
+    merged["ANNOTATORS"] = [
+        ";".join(annotators[bounds[i] : bounds[i + 1]]) for i in range(n_obj)
+    ]
+
+    n_levels = len(QUALITY_LEVELS)
+    for name in [n for n in stacked.colnames if n.endswith("_QUALITY")]:
+        codes = np.asarray(encode_quality(stacked[name]), dtype=int) - 1
+        valid = codes >= 0
+        counts = np.bincount(
+            inv[valid] * n_levels + codes[valid], minlength=n_obj * n_levels
+        ).reshape(n_obj, n_levels)
+        n_valid = counts.sum(axis=1)
+        # Reversing the levels before argmax resolves ties to the worse value
+        consensus = n_levels - 1 - np.argmax(counts[:, ::-1], axis=1)
+        n_agree = counts[np.arange(n_obj), consensus]
+
+        beam = name.removesuffix("_QUALITY")
+        merged[name] = np.where(n_valid > 0, consensus + 1, 0).astype(np.uint8)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merged[f"{beam}_AGREEMENT"] = n_agree / n_valid
+        merged[f"{beam}_DISAGREE"] = n_agree < n_valid
+
+    if "ESTIMATED_REDSHIFT" in stacked.colnames:
+        z = np.asarray(
+            np.ma.filled(stacked["ESTIMATED_REDSHIFT"].astype(float), np.nan)
+        )
+        z_mean, z_counts = _group_mean(z, inv, n_obj)
+        z_sq, _ = _group_mean(z**2, inv, n_obj)
+        merged["Z_MEAN"] = z_mean
+        merged["Z_STD"] = np.sqrt(np.clip(z_sq - z_mean**2, 0, None))
+
+        # Sorting by object, then redshift, gives the median and range of
+        # each object from the group boundaries
+        z_order = np.lexsort((np.where(np.isfinite(z), z, np.inf), inv))
+        z_sorted = z[z_order]
+        starts = bounds[:-1]
+        has_z = z_counts > 0
+        lo = starts + np.clip((z_counts - 1) // 2, 0, None)
+        hi = starts + np.clip(z_counts // 2, 0, None)
+        z_min = np.full(n_obj, np.nan)
+        z_max = np.full(n_obj, np.nan)
+        z_med = np.full(n_obj, np.nan)
+        z_min[has_z] = z_sorted[starts[has_z]]
+        z_max[has_z] = z_sorted[starts[has_z] + z_counts[has_z] - 1]
+        z_med[has_z] = 0.5 * (z_sorted[lo[has_z]] + z_sorted[hi[has_z]])
+        merged["Z_MEDIAN"] = z_med
+        merged["Z_MIN"] = z_min
+        merged["Z_MAX"] = z_max
+        with np.errstate(invalid="ignore"):
+            merged["Z_DISAGREE"] = (z_max - z_min) > z_tolerance * (1 + z_med)
+
+    # Older catalogues store each flag as a separate column
+    flags = np.zeros(len(stacked), dtype=np.uint8)
+    if "FLAGS" in stacked.colnames:
+        flags |= np.ma.filled(stacked["FLAGS"], 0).astype(np.uint8)
+    for name, bit in FLAG_BITS.items():
+        if name in stacked.colnames:
+            flags[np.ma.filled(stacked[name], False).astype(bool)] |= bit
+    if "FLAGS" in stacked.colnames or any(n in stacked.colnames for n in FLAG_BITS):
+        for name, out_name in [
+            ("UNRELIABLE_REDSHIFT", "UNRELIABLE_FRAC"),
+            ("TENTATIVE_REDSHIFT", "TENTATIVE_FRAC"),
+            ("BAD_SEG_MAP", "BAD_SEG_FRAC"),
+        ]:
+            merged[out_name], _ = _group_mean(
+                ((flags & FLAG_BITS[name]) > 0).astype(float), inv, n_obj
+            )
+
+    return merged
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+def grid_cells(width, height, n_rows, width_ratios, margins=(0, 0, 0, 0), gap=2):
+    """
+    Divide an image into a grid of panels.
+
+    Parameters
+    ----------
+    width, height : int
+        The size of the image in pixels.
+    n_rows : int
+        The number of rows of panels.
+    width_ratios : list of float
+        The relative width of each column.
+    margins : tuple of int, optional
+        The space left for labels at the ``(left, bottom, right, top)`` of
+        the image, in pixels.
+    gap : int, optional
+        The space between adjacent panels, by default 2 pixels.
+
+    Returns
+    -------
+    list of list of tuple
+        The ``(y0, y1, x0, x1)`` pixel bounds of each panel, indexed by
+        ``[row][column]``. Row 0 is at the top of the image.
+    """
+    left, bottom, right, top = margins
+    n_cols = len(width_ratios)
+    inner_w = max(width - left - right - gap * (n_cols - 1), n_cols)
+    inner_h = max(height - top - bottom - gap * (n_rows - 1), n_rows)
+
+    ratios = np.asarray(width_ratios, dtype=float)
+    x_edges = np.round(
+        np.concatenate([[0], np.cumsum(ratios)]) / ratios.sum() * inner_w
+    )
+    y_edges = np.round(np.linspace(0, inner_h, n_rows + 1))
+
+    cells = []
+    for i in range(n_rows):
+        y0 = top + int(y_edges[i]) + i * gap
+        y1 = top + int(y_edges[i + 1]) + i * gap
+        row = []
+        for j in range(n_cols):
+            x0 = left + int(x_edges[j]) + j * gap
+            x1 = left + int(x_edges[j + 1]) + j * gap
+            row.append((y0, max(y1, y0 + 1), x0, max(x1, x0 + 1)))
+        cells.append(row)
+    return cells
+
+
+def fit_cell(cell, shape):
+    """
+    Find the largest region of a panel with the same aspect as an image.
+
+    Parameters
+    ----------
+    cell : tuple of int
+        The ``(y0, y1, x0, x1)`` bounds of the panel, as returned by
+        `grid_cells`.
+    shape : tuple of int
+        The ``(ny, nx)`` shape of the image.
+
+    Returns
+    -------
+    tuple of int
+        The ``(y0, y1, x0, x1)`` bounds of the region, centred in the panel,
+        in which each image pixel is square.
+    """
+    y0, y1, x0, x1 = cell
+    scale = min((y1 - y0) / max(shape[0], 1), (x1 - x0) / max(shape[1], 1))
+    h = max(int(round(shape[0] * scale)), 1)
+    w = max(int(round(shape[1] * scale)), 1)
+    y0 += (y1 - y0 - h) // 2
+    x0 += (x1 - x0 - w) // 2
+    return (y0, y0 + h, x0, x0 + w)
+
+
+def paint_panel(buffer, cell, data, norm, cmap):
+    """
+    Draw an image into one panel of an RGBA buffer.
+
+    The image is resampled to the size of the panel using the nearest pixel,
+    and flipped so that the first row of ``data`` is at the bottom.
+
+    Parameters
+    ----------
+    buffer : numpy.ndarray
+        The ``(height, width, 4)`` array of RGBA values to draw into, between
+        0 and 1.
+    cell : tuple of int
+        The ``(y0, y1, x0, x1)`` bounds of the panel, as returned by
+        `grid_cells`.
+    data : numpy.ndarray
+        The 2D image.
+    norm : matplotlib.colors.Normalize
+        Maps the data values to the interval [0, 1].
+    cmap : matplotlib.colors.Colormap
+        The colourmap. Non-finite values use the colour set for bad values.
+    """
+    y0, y1, x0, x1 = cell
+    rows = (np.arange(y1 - y0) * data.shape[0]) // (y1 - y0)
+    cols = (np.arange(x1 - x0) * data.shape[1]) // (x1 - x0)
+    sub = np.ma.masked_invalid(data[rows[::-1]][:, cols])
+    buffer[y0:y1, x0:x1] = cmap(norm(sub))
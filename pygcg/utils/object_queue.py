@@ -0,0 +1,112 @@
+import numpy as np
+
+
+class ObjectQueue:
+    """
+    The ordered queue of objects to be classified.
+
+    Only the position of the current object (the cursor) is stored, along
+    with dictionaries mapping each ``id`` and ``seg_id`` to its position, so
+    that navigation does not need to search the whole catalogue. The ids
+    themselves are kept by the caller, in the same order.
+
+    Parameters
+    ----------
+    ids : array-like
+        The catalogue ids of the objects, in order.
+    seg_ids : array-like
+        The corresponding segmentation ids.
+    """
+
+    def __init__(self, ids, seg_ids):
+        self.id_pos = {}
+        self.seg_pos = {}
+        self.n_objects = 0
+        self.cursor = 0
+        self.extend(ids, seg_ids)
+
+    def __len__(self):
+        return self.n_objects
+
+    def extend(self, ids, seg_ids):
+        """
+        Append objects to the end of the queue.
+
+        Parameters
+        ----------
+        ids : array-like
+            The catalogue ids of the new objects.
+        seg_ids : array-like
+            The corresponding segmentation ids.
+        """
+        for i, s in zip(np.asarray(ids).astype(str), np.asarray(seg_ids).astype(int)):
+            # If an id is repeated, the first position is used
+            self.id_pos.setdefault(str(i), self.n_objects)
+            self.seg_pos.setdefault(int(s), self.n_objects)
+            self.n_objects += 1
+
+    def find_id(self, obj_id):
+        """
+        Find the position of an object from its id.
+
+        Parameters
+        ----------
+        obj_id : str
+            The catalogue id.
+
+        Returns
+        -------
+        int
+            The position in the queue.
+
+        Raises
+        ------
+        KeyError
+            If the object is not in the queue.
+        """
+        return self.id_pos[str(obj_id)]
+
+    def find_seg_id(self, seg_id):
+        """
+        Find the position of an object from its segmentation id.
+
+        Parameters
+        ----------
+        seg_id : int
+            The segmentation id.
+
+        Returns
+        -------
+        int
+            The position in the queue.
+
+        Raises
+        ------
+        KeyError
+            If the object is not in the queue.
+        """
+        return self.seg_pos[int(seg_id)]
+
+    def move_to(self, pos):
+        self.cursor = int(pos) % self.n_objects
+        return self.cursor
+
+    def step(self, n=1):
+        """
+        Move the cursor forwards (or backwards), wrapping around at the ends.
+
+        Parameters
+        ----------
+        n : int, optional
+            The number of positions to move, by default 1.
+
+        Returns
+        -------
+        int
+            The new position of the cursor.
+        """
+        return self.move_to(self.cursor + n)
+
+    @property
+    def at_end(self):
+        return self.cursor == self.n_objects - 1
@@ -0,0 +1,285 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import astropy.io.fits as pf
+import numpy as np
+
+from .cache import FileCache
+
+# The header keywords recorded for each HDU, which describe the layout of a
+# grizli stack file. The GRISMnnn and N{grism} keywords of the primary header
+# are also recorded.
+RECORDED_KEYWORDS = ["NAXIS1", "NAXIS2", "WMIN", "WMAX", "NGRISM"]
+
+# Reading a single HDU from a known offset relies on private parts of
+# astropy.io.fits (tested with astropy 8.0.1). If these are unavailable, the
+# file is opened with `astropy.io.fits.open` instead, which is slower but
+# gives the same result
+try:
+    from astropy.io.fits.file import _File
+    from astropy.io.fits.hdu.base import _BaseHDU
+
+    HAS_FITS_INTERNALS = True
+except:
+    HAS_FITS_INTERNALS = False
+
+
+def _data_span(header):
+    # The size of the data (including any heap), padded to whole blocks
+    naxis = header.get("NAXIS", 0)
+    if naxis == 0:
+        return 0
+    n_elements = int(np.prod([header.get(f"NAXIS{i}", 0) for i in range(1, naxis + 1)]))
+    size = (
+        abs(header["BITPIX"])
+        // 8
+        * header.get("GCOUNT", 1)
+        * (header.get("PCOUNT", 0) + n_elements)
+    )
+    return size + (-size % 2880)
+
+
+def _json_value(value):
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _header_keywords(header):
+    keywords = {k: _json_value(header[k]) for k in RECORDED_KEYWORDS if k in header}
+    for n in range(1, int(header.get("NGRISM", 0)) + 1):
+        grism = header.get(f"GRISM{n:0>3}")
+        if grism is not None:
+            keywords[f"GRISM{n:0>3}"] = str(grism)
+            keywords[f"N{grism}"] = _json_value(header.get(f"N{grism}", 0))
+    return keywords
+
+
+def scan_hdu_offsets(path):
+    """
+    Find the location of every HDU in a FITS file.
+
+    Only the headers are parsed, and the data of each HDU is skipped over.
+    A few keywords of each header (see ``RECORDED_KEYWORDS``) are kept, so
+    that the contents of the file can be described without reading it
+    again.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The FITS file.
+
+    Returns
+    -------
+    list of list
+        One ``[extname, extver, header_offset, header_length, data_span,
+        keywords]`` entry per HDU, in the order in which they appear. Names
+        are upper case, the first HDU is named ``"PRIMARY"`` unless it has an
+        ``EXTNAME``, versions are strings (``"1"`` if not set), and
+        ``keywords`` is a dictionary of the recorded header keywords.
+    """
+    hdus = []
+    with open(path, mode="rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        while fp.tell() < size:
+            offset = fp.tell()
+            header = pf.Header.fromfile(fp, endcard=True, padding=True)
+            header_length = fp.tell() - offset
+            default = "PRIMARY" if len(hdus) == 0 else ""
+            data_span = _data_span(header)
+            hdus.append(
+                [
+                    str(header.get("EXTNAME", default)).strip().upper(),
+                    str(header.get("EXTVER", 1)),
+                    offset,
+                    header_length,
+                    data_span,
+                    _header_keywords(header),
+                ]
+            )
+            fp.seek(offset + header_length + data_span)
+    return hdus
+
+
+class HDUReader:
+    """
+    Read individual HDUs from a FITS file, using a known set of offsets.
+
+    Each HDU is read by seeking directly to its header, and its data is
+    memory-mapped, so that no other part of the file is touched. If the
+    private astropy API used for this is not available, the file is opened
+    with `astropy.io.fits.open` instead.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The FITS file.
+    offsets : list of list
+        The output of `scan_hdu_offsets` for this file.
+    """
+
+    def __init__(self, path, offsets):
+        self.path = path
+        # If a name and version is repeated, the first HDU is used, as in
+        # `astropy.io.fits.HDUList`
+        self.offsets = {}
+        for i, o in enumerate(offsets):
+            self.offsets.setdefault((o[0], o[1]), [*o, i])
+        self._file = None
+        self._hdul = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def keys(self):
+        """
+        List the HDUs in the file.
+
+        Returns
+        -------
+        list of tuple
+            The ``(extname, extver)`` of each HDU.
+        """
+        return list(self.offsets.keys())
+
+    def __contains__(self, key):
+        return self._key(key) in self.offsets
+
+    def _key(self, key):
+        if isinstance(key, tuple):
+            name, ver = key
+        else:
+            name, ver = key, 1
+        return (str(name).strip().upper(), str(ver))
+
+    def __getitem__(self, key):
+        """
+        Read a single HDU.
+
+        Parameters
+        ----------
+        key : str or tuple
+            Either the extension name, or ``(extname, extver)``.
+
+        Returns
+        -------
+        astropy.io.fits.hdu.base._BaseHDU
+            The HDU, of the appropriate type. The data remains valid after
+            the reader is closed.
+
+        Raises
+        ------
+        KeyError
+            If the HDU is not in the file.
+        """
+        entry = self.offsets[self._key(key)]
+        if not HAS_FITS_INTERNALS:
+            if self._hdul is None:
+                self._hdul = pf.open(self.path, memmap=True)
+            hdu = self._hdul[entry[-1]]
+            # The data is accessed now, so that it remains valid after closing
+            hdu.data
+            return hdu
+        if self._file is None:
+            self._file = _File(self.path, mode="readonly", memmap=True)
+        self._file.seek(entry[2])
+        # The HDU class is chosen from the header
+        return _BaseHDU.readfrom(self._file)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._hdul is not None:
+            self._hdul.close()
+            self._hdul = None
+
+
+class HDUOffsetIndex(FileCache):
+    """
+    A cache of the HDU offsets and header keywords of each FITS file.
+
+    This is the single index of the stack files, used both to read
+    individual extensions and to describe their contents (see
+    `pygcg.utils.stack_metadata`). Entries are keyed by path, and are
+    invalidated if the size or modification time of the file changes.
+
+    Parameters
+    ----------
+    cache_path : str or os.PathLike, optional
+        A JSON file in which the cache is stored between sessions.
+    """
+
+    description = "HDU offset index"
+
+    def read_file(self, path):
+        return scan_hdu_offsets(path)
+
+    def get(self, path):
+        """
+        Return the HDU offsets of a file, scanning the file if necessary.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The FITS file.
+
+        Returns
+        -------
+        list of list
+            The output of `scan_hdu_offsets`.
+
+        Raises
+        ------
+        OSError
+            If the file cannot be read.
+        """
+        return self.lookup(str(path), path)
+
+    def open(self, path):
+        """
+        Open a FITS file for random access to its HDUs.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The FITS file.
+
+        Returns
+        -------
+        HDUReader
+            The reader, which should be closed after use.
+        """
+        return HDUReader(path, self.get(path))
+
+    def prefetch(self, paths, n_threads=1, write=True):
+        """
+        Scan many files in parallel.
+
+        Files which cannot be read are skipped.
+
+        Parameters
+        ----------
+        paths : list of str or os.PathLike
+            The FITS files. Entries of ``None`` are ignored.
+        n_threads : int, optional
+            The number of threads used to read the files.
+        write : bool, optional
+            Save the cache to ``cache_path`` afterwards, by default ``True``.
+        """
+
+        def _scan(path):
+            try:
+                self.get(path)
+            except OSError:
+                pass
+            except Exception as e:
+                print(f"Could not read the headers of {path}: {e}")
+
+        with ThreadPoolExecutor(max_workers=max(int(n_threads), 1)) as executor:
+            list(executor.map(_scan, [p for p in paths if p is not None]))
+        if write:
+            self.write()
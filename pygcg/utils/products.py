@@ -0,0 +1,477 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+from astropy.table import Table
+
+# The suffixes of the grizli data products used by pyGCG, following the
+# zero-padded segmentation ID (e.g. `nis-wfss_00076.stack.fits').
+# Longer suffixes are listed first, so that `1D_RC' is not mistaken for `1D'.
+PRODUCT_TYPES = [
+    "spec2D",
+    "spec1D",
+    "1D_RC",
+    "stack",
+    "zinfo",
+    "full",
+    "maps",
+    "row",
+    "1D",
+]
+
+# Directories modified less than this many seconds before they were listed
+# are always listed again, as a coarse mtime may hide later changes.
+_RACY_INTERVAL = 2.0
+
+
+def parse_product_name(name, pad=5):
+    """
+    Split the file name of a data product into the segmentation ID and type.
+
+    Parameters
+    ----------
+    name : str
+        The file name, e.g. `nis-wfss_00076.stack.fits'.
+    pad : int, optional
+        The number of characters in the zero-padded segmentation ID.
+
+    Returns
+    -------
+    tuple or None
+        ``(seg_id, product_type)``, or ``None`` if ``name`` is not a
+        recognised data product.
+    """
+    if not name.endswith(".fits"):
+        return None
+    stem = name[:-5]
+    for p_type in PRODUCT_TYPES:
+        if stem.endswith(f".{p_type}"):
+            end = -len(p_type) - 1
+            seg_id = stem[end - pad : end]
+            if len(seg_id) == pad:
+                return seg_id, p_type
+            return None
+    return None
+
+
+def _visit_dir(root, rel_dir, suffix, cached=None):
+    try:
+        stat = os.stat(os.path.join(root, rel_dir))
+    except OSError as e:
+        print(f"Could not scan {rel_dir}: {e}")
+        return None, False
+
+    if (
+        cached is not None
+        and cached["mtime"] == stat.st_mtime_ns
+        and cached["nlink"] == stat.st_nlink
+        and cached["listed"] - stat.st_mtime_ns / 1e9 > _RACY_INTERVAL
+    ):
+        return cached, False
+
+    listed = time.time()
+    files, sub_dirs = [], []
+    try:
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for entry in it:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir():
+                    sub_dirs.append(rel_path)
+                elif entry.name.endswith(suffix):
+                    files.append(rel_path)
+    except OSError as e:
+        print(f"Could not scan {rel_dir}: {e}")
+        return None, False
+
+    return {
+        "mtime": stat.st_mtime_ns,
+        "nlink": stat.st_nlink,
+        "listed": listed,
+        "files": sorted(files),
+        "dirs": sorted(sub_dirs),
+    }, True
+
+
+def walk_tree(root, suffix=".fits", n_threads=1, cache=None):
+    """
+    Walk a directory tree, listing only the directories that have changed.
+
+    On network filesystems, the walk is dominated by the latency of each
+    directory listing. If ``n_threads > 1``, each subdirectory is visited
+    as a separate task in a thread pool, so that many requests are in
+    flight at once. If ``cache`` is supplied, directories whose mtime and
+    link count are unchanged are not listed again.
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The directory to walk.
+    suffix : str, optional
+        The suffix of the files to record, by default ``".fits"``.
+    n_threads : int, optional
+        The number of threads used to visit directories, by default 1.
+    cache : dict, optional
+        The output of a previous call to `walk_tree`.
+
+    Returns
+    -------
+    dirs : dict
+        A dictionary of ``{rel_dir: listing}``, where each listing records
+        the mtime and link count of the directory, and the matching files
+        and subdirectories within it.
+    changed : set
+        The directories which were (re-)listed during this walk.
+    """
+    cache = {} if cache is None else cache
+    dirs, changed = {}, set()
+
+    def _record(rel_dir, result):
+        listing, was_listed = result
+        if listing is None:
+            return []
+        dirs[rel_dir] = listing
+        if was_listed:
+            changed.add(rel_dir)
+        return listing["dirs"]
+
+    if n_threads <= 1:
+        to_visit = [""]
+        while to_visit:
+            rel_dir = to_visit.pop()
+            to_visit.extend(
+                _record(rel_dir, _visit_dir(root, rel_dir, suffix, cache.get(rel_dir)))
+            )
+    else:
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            pending = {executor.submit(_visit_dir, root, "", suffix, cache.get("")): ""}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rel_dir = pending.pop(future)
+                    for d in _record(rel_dir, future.result()):
+                        pending[
+                            executor.submit(_visit_dir, root, d, suffix, cache.get(d))
+                        ] = d
+    return dirs, changed
+
+
+def scan_tree(root, suffix=".fits", n_threads=1):
+    """
+    Find all files with a given suffix below a directory.
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The directory to walk.
+    suffix : str, optional
+        The suffix of the files to return, by default ``".fits"``.
+    n_threads : int, optional
+        The number of threads used to list directories, by default 1.
+
+    Returns
+    -------
+    list of str
+        The sorted paths of the matching files, relative to ``root``.
+    """
+    dirs, _ = walk_tree(root, suffix=suffix, n_threads=n_threads)
+    return sorted(f for listing in dirs.values() for f in listing["files"])
+
+
+class ProductIndex:
+    """
+    A map from each zero-padded segmentation ID to its data products.
+
+    Parameters
+    ----------
+    root : str or os.PathLike
+        The extractions directory. All paths are stored relative to this.
+    pad : int, optional
+        The number of characters in the zero-padded segmentation ID.
+    products : dict, optional
+        A nested dictionary of ``{seg_id: {product_type: [rel_path, ...]}}``.
+    dirs : dict, optional
+        The directory listings used to build ``products``, as returned by
+        `walk_tree`.
+    """
+
+    def __init__(self, root, pad=5, products=None, dirs=None):
+        self.root = Path(root)
+        self.pad = int(pad)
+        self.products = {} if products is None else products
+        self.dirs = {} if dirs is None else dirs
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, seg_id):
+        return self.key(seg_id) in self.products
+
+    def key(self, seg_id):
+        return f"{seg_id:0>{self.pad}}"
+
+    def add(self, rel_path):
+        parsed = parse_product_name(Path(rel_path).name, pad=self.pad)
+        if parsed is None:
+            return None
+        seg_id, p_type = parsed
+        paths = self.products.setdefault(seg_id, {}).setdefault(p_type, [])
+        if Path(rel_path).as_posix() not in paths:
+            paths.append(Path(rel_path).as_posix())
+        return seg_id
+
+    def discard(self, rel_path):
+        parsed = parse_product_name(Path(rel_path).name, pad=self.pad)
+        if parsed is None:
+            return None
+        seg_id, p_type = parsed
+        try:
+            paths = self.products[seg_id][p_type]
+            paths.remove(Path(rel_path).as_posix())
+            if len(paths) == 0:
+                del self.products[seg_id][p_type]
+            if len(self.products[seg_id]) == 0:
+                del self.products[seg_id]
+        except (KeyError, ValueError):
+            pass
+        return seg_id
+
+    @classmethod
+    def build(cls, root, pad=5, n_threads=1):
+        """
+        Index all data products below ``root`` in a single directory walk.
+
+        Parameters
+        ----------
+        root : str or os.PathLike
+            The extractions directory.
+        pad : int, optional
+            The number of characters in the zero-padded segmentation ID.
+        n_threads : int, optional
+            The number of threads used to walk the directory tree.
+
+        Returns
+        -------
+        ProductIndex
+            The populated index.
+        """
+        index = cls(root, pad=pad)
+        index.update(n_threads=n_threads)
+        return index
+
+    def update(self, n_threads=1):
+        """
+        Rescan the directory tree, and merge any changes into the index.
+
+        Only directories which have been modified since they were last
+        listed are read again.
+
+        Parameters
+        ----------
+        n_threads : int, optional
+            The number of threads used to walk the directory tree.
+
+        Returns
+        -------
+        set
+            The directories which were (re-)listed.
+        """
+        new_dirs, changed = walk_tree(
+            self.root, suffix=".fits", n_threads=n_threads, cache=self.dirs
+        )
+        self.merge(new_dirs, changed)
+        return changed
+
+    def merge(self, new_dirs, changed):
+        """
+        Replace the directory listings, and update the affected products.
+
+        Parameters
+        ----------
+        new_dirs : dict
+            The new directory listings, as returned by `walk_tree` with
+            ``cache=self.dirs``.
+        changed : set
+            The directories which were listed again in ``new_dirs``.
+
+        Returns
+        -------
+        set
+            The zero-padded IDs of all objects whose products changed.
+        """
+        stale = changed | (self.dirs.keys() - new_dirs.keys())
+        touched = set()
+        for rel_dir in stale:
+            for f in self.dirs.get(rel_dir, {}).get("files", []):
+                touched.add(self.discard(f))
+        for rel_dir in changed:
+            for f in new_dirs[rel_dir]["files"]:
+                touched.add(self.add(f))
+        touched.discard(None)
+        self.dirs = new_dirs
+        self.sort(touched)
+        return touched
+
+    def sort(self, seg_ids=None):
+        if seg_ids is None:
+            seg_ids = self.products.keys()
+        for s in seg_ids:
+            for paths in self.products.get(s, {}).values():
+                paths.sort()
+
+    def get(self, seg_id, *p_types):
+        """
+        Find all products of the requested types for a single object.
+
+        Parameters
+        ----------
+        seg_id : int or str
+            The segmentation ID of the object.
+        *p_types : str
+            The product types to return, in order of preference.
+
+        Returns
+        -------
+        list of pathlib.Path
+            The absolute paths, ordered first by ``p_types``.
+        """
+        entry = self.products.get(self.key(seg_id), {})
+        return [self.root / p for t in p_types for p in entry.get(t, [])]
+
+    def has(self, seg_id, *p_types):
+        entry = self.products.get(self.key(seg_id), {})
+        return any(t in entry for t in p_types)
+
+    def first(self, seg_id, *p_types):
+        paths = self.get(seg_id, *p_types)
+        if len(paths) == 0:
+            return None
+        return paths[0]
+
+    def seg_ids(self, *p_types):
+        """
+        The set of zero-padded IDs with at least one of the requested types.
+        """
+        return {
+            s for s, entry in self.products.items() if any(t in entry for t in p_types)
+        }
+
+    def write(self, path):
+        with open(path, mode="wt", encoding="utf-8") as fp:
+            json.dump(
+                {
+                    "root": str(self.root),
+                    "pad": self.pad,
+                    "products": self.products,
+                    "dirs": self.dirs,
+                },
+                fp,
+                separators=(",", ":"),
+            )
+
+    @classmethod
+    def read(cls, path):
+        with open(path, mode="rt", encoding="utf-8") as fp:
+            contents = json.load(fp)
+        return cls(
+            contents["root"],
+            pad=contents["pad"],
+            products=contents["products"],
+            dirs=contents.get("dirs", {}),
+        )
+
+    def to_manifest(self, n_threads=1):
+        """
+        Tabulate every indexed product, with its size and modification time.
+
+        Parameters
+        ----------
+        n_threads : int, optional
+            The number of threads used to stat the files.
+
+        Returns
+        -------
+        astropy.table.Table
+            A table with one row per file, with columns ``SEG_ID``,
+            ``TYPE``, ``PATH`` (relative to the root directory), ``SIZE``
+            and ``MTIME``.
+        """
+        rows = [
+            (s, t, p)
+            for s, entry in sorted(self.products.items())
+            for t, paths in sorted(entry.items())
+            for p in paths
+        ]
+
+        def _stat(rel_path):
+            try:
+                stat = os.stat(self.root / rel_path)
+                return stat.st_size, stat.st_mtime
+            except OSError:
+                return -1, np.nan
+
+        with ThreadPoolExecutor(max_workers=max(int(n_threads), 1)) as executor:
+            stats = list(executor.map(_stat, [r[2] for r in rows]))
+
+        manifest = Table(
+            [
+                np.array([r[0] for r in rows], dtype=str),
+                np.array([r[1] for r in rows], dtype=str),
+                np.array([r[2] for r in rows], dtype=str),
+                np.array([st[0] for st in stats], dtype=np.int64),
+                np.array([st[1] for st in stats], dtype=np.float64),
+            ],
+            names=["SEG_ID", "TYPE", "PATH", "SIZE", "MTIME"],
+        )
+        manifest.meta["ROOT"] = str(self.root)
+        manifest.meta["PAD"] = self.pad
+        return manifest
+
+    def write_manifest(self, path, n_threads=1):
+        """
+        Write the index as a manifest table (FITS or ECSV, by file suffix).
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The output path.
+        n_threads : int, optional
+            The number of threads used to stat the files.
+        """
+        self.to_manifest(n_threads=n_threads).write(path, overwrite=True)
+
+    @classmethod
+    def read_manifest(cls, path, root=None, pad=None):
+        """
+        Load an index from a manifest written by `write_manifest`.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The path of the manifest.
+        root : str or os.PathLike, optional
+            The directory to which the paths in the manifest are relative.
+            This only needs to be given if the extractions directory has been
+            moved, or is mounted elsewhere, since the manifest was written.
+        pad : int, optional
+            The number of characters in the zero-padded segmentation ID. By
+            default, this is the value used to write the manifest.
+
+        Returns
+        -------
+        ProductIndex
+            The index. No directory listings are stored, so any later call
+            to `update` will list the entire tree.
+        """
+        manifest = Table.read(path)
+        meta = {str(k).upper(): v for k, v in manifest.meta.items()}
+        index = cls(
+            meta["ROOT"] if root is None else root,
+            pad=meta.get("PAD", 5) if pad is None else pad,
+        )
+        for rel_path in manifest["PATH"]:
+            index.add(str(rel_path))
+        index.sort()
+        return index
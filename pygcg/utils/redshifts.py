@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import astropy.io.fits as pf
+import numpy as np
+from astropy.table import Table
+
+from .cache import FileCache
+
+
+def read_grizli_summary(path):
+    """
+    Read the redshift and line fluxes from a grizli output file.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The path of either a ``*.row.fits`` file, or a ``*.full.fits``,
+        ``*.maps.fits``, or ``*.zinfo.fits`` file.
+
+    Returns
+    -------
+    dict
+        A dictionary containing the best-fit redshift (``"redshift"``), and
+        the detected lines (``"lines"``). The latter is a dictionary of
+        ``{line: {"flux": ..., "sn": ...}}``.
+    """
+    lines = {}
+    with pf.open(path) as hdul:
+        if Path(path).name.endswith(".row.fits"):
+            _tab_data = Table(hdul[1].data)
+            redshift = float(_tab_data["redshift"].value[0])
+            try:
+                for l in _tab_data["haslines"].value[0].split():
+                    lines[l] = {
+                        "flux": float(_tab_data[f"flux_{l}"].value[0]),
+                        "sn": float(_tab_data[f"sn_{l}"].value[0]),
+                    }
+            except Exception as e:
+                lines = {}
+        else:
+            redshift = float(hdul[1].header["Z_MAP"])
+            _line_hdr = hdul[0].header
+            try:
+                for i_l, l in enumerate(_line_hdr["HASLINES"].split()):
+                    lines[l] = {
+                        "flux": float(_line_hdr[f"flux{i_l+1:0>3}"]),
+                        "sn": float(
+                            _line_hdr[f"flux{i_l+1:0>3}"] / _line_hdr[f"err{i_l+1:0>3}"]
+                        ),
+                    }
+            except Exception as e:
+                lines = {}
+
+    return {"redshift": redshift, "lines": lines}
+
+
+class GrizliSummary(FileCache):
+    """
+    The grizli redshifts and line fluxes of every object in a field.
+
+    Entries are keyed by ``seg_id``, and are invalidated if the size or
+    modification time of the source file changes.
+
+    Parameters
+    ----------
+    product_index : pygcg.utils.ProductIndex
+        The index used to locate the grizli output files.
+    cache_path : str or os.PathLike, optional
+        A JSON file in which the summary is stored between sessions.
+    """
+
+    description = "grizli summary"
+
+    def __init__(self, product_index, cache_path=None):
+        super().__init__(cache_path)
+        self.product_index = product_index
+
+    def read_file(self, path):
+        return read_grizli_summary(path)
+
+    def _lookup(self, seg_id):
+        key = self.product_index.key(seg_id)
+        # The small *row files are preferred, as in the default reduction
+        for path in (
+            self.product_index.first(key, "row"),
+            self.product_index.first(key, "full", "maps", "zinfo"),
+        ):
+            if path is None:
+                continue
+            try:
+                return self.lookup(key, path)
+            except Exception as e:
+                continue
+        return None
+
+    def get(self, seg_id):
+        """
+        Return the summary for one object, reading the file if necessary.
+
+        Parameters
+        ----------
+        seg_id : int or str
+            The segmentation id of the object.
+
+        Returns
+        -------
+        dict or None
+            The output of `read_grizli_summary`, or ``None`` if no grizli
+            output could be read.
+        """
+        return self._lookup(seg_id)
+
+    def prefetch(self, seg_ids, n_threads=1, write=True):
+        """
+        Read the summaries for many objects in parallel.
+
+        Parameters
+        ----------
+        seg_ids : array-like
+            The segmentation ids of the objects.
+        n_threads : int, optional
+            The number of threads used to read the files.
+        write : bool, optional
+            Save the summary to ``cache_path`` afterwards, by default
+            ``True``.
+        """
+        with ThreadPoolExecutor(max_workers=max(int(n_threads), 1)) as executor:
+            list(executor.map(self._lookup, seg_ids))
+        if write:
+            self.write()
+
+    def to_table(self, seg_ids=None):
+        """
+        Stack the summaries into a single table.
+
+        Parameters
+        ----------
+        seg_ids : array-like, optional
+            The objects to include, in order. By default, all entries are
+            returned.
+
+        Returns
+        -------
+        astropy.table.Table
+            A table with the columns ``SEG_ID``, ``Z_GRIZLI``, ``N_LINES``,
+            ``BEST_LINE``, and ``MAX_SN``. Objects without any grizli output
+            have a redshift and S/N of ``NaN``.
+        """
+        entries = self.values()
+        if seg_ids is None:
+            keys = sorted(entries.keys())
+        else:
+            keys = [self.product_index.key(s) for s in seg_ids]
+
+        z_grizli = np.full(len(keys), np.nan, dtype=float)
+        n_lines = np.zeros(len(keys), dtype=int)
+        best_line = np.full(len(keys), "", dtype=object)
+        max_sn = np.full(len(keys), np.nan, dtype=float)
+        for i, k in enumerate(keys):
+            entry = entries.get(k)
+            if entry is None:
+                continue
+            z_grizli[i] = entry["redshift"]
+            n_lines[i] = len(entry["lines"])
+            if n_lines[i] > 0:
+                sns = {l: v["sn"] for l, v in entry["lines"].items()}
+                best_line[i] = max(
+                    sns, key=lambda l: np.nan_to_num(sns[l], nan=-np.inf)
+                )
+                max_sn[i] = sns[best_line[i]]
+
+        return Table(
+            [
+                np.array(keys, dtype=str),
+                z_grizli,
+                n_lines,
+                best_line.astype(str),
+                max_sn,
+            ],
+            names=["SEG_ID", "Z_GRIZLI", "N_LINES", "BEST_LINE", "MAX_SN"],
+        )
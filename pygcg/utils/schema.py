@@ -0,0 +1,276 @@
+import numpy as np
+from astropy.table import MaskedColumn, QTable
+
+# The possible beam qualities, from best to worst. These are stored in the
+# output catalogue as the codes in ``QUALITY_CODES``, with 0 meaning that no
+# quality was assigned.
+QUALITY_LEVELS = ["Excellent", "Good", "Poor", "Unusable"]
+QUALITY_CODES = {q: i + 1 for i, q in enumerate(QUALITY_LEVELS)}
+
+# The boolean flags, packed into the bits of the ``FLAGS`` column.
+FLAG_BITS = {
+    "UNRELIABLE_REDSHIFT": 1,
+    "TENTATIVE_REDSHIFT": 2,
+    "BAD_SEG_MAP": 4,
+}
+
+
+def grism_names(grisms):
+    """
+    Read the grism filters and position angles from the configuration.
+
+    Parameters
+    ----------
+    grisms : dict
+        The ``[grisms]`` table of the configuration file. The ``filters``
+        and ``PAs`` lists are used if present, and otherwise the single
+        ``R``, ``G``, ``B`` and ``PA1``, ``PA2`` keys.
+
+    Returns
+    -------
+    filter_names : list of str
+        The grism filters, from the longest to the shortest wavelength.
+    PAs : list of str
+        The position angles.
+    """
+    filter_names = grisms.get(
+        "filters",
+        [grisms.get("R", "F200W"), grisms.get("G", "F150W"), grisms.get("B", "F115W")],
+    )
+    PAs = grisms.get("PAs", [grisms.get("PA1", 72.0), grisms.get("PA2", 341.0)])
+    return [str(f) for f in filter_names], [str(p) for p in PAs]
+
+
+def beam_names(filter_names, PAs):
+    """
+    Find the name of each beam, for any number of filters and orientations.
+
+    Parameters
+    ----------
+    filter_names : list of str
+        The grism filters.
+    PAs : list of str
+        The position angles.
+
+    Returns
+    -------
+    list of str
+        The beams, as ``"{filter},{PA}"``, ordered by position angle.
+    """
+    return [f"{f},{p}" for p in PAs for f in filter_names]
+
+
+def output_columns(beams):
+    """
+    Define the columns of the output catalogue.
+
+    Parameters
+    ----------
+    beams : list of str
+        The beams which can be classified, as returned by `beam_names`.
+
+    Returns
+    -------
+    list of tuple
+        The ``(name, dtype, unit)`` of each column.
+    """
+    columns = [
+        ("ID", str, None),
+        ("SEG_ID", np.int32, None),
+        ("RA", np.float64, "deg"),
+        ("DEC", np.float64, "deg"),
+    ]
+    for b in beams:
+        columns.append((f"{b}_QUALITY", np.uint8, None))
+        columns.append((f"{b}_COVERAGE", np.float32, None))
+    columns.extend(
+        [
+            ("GRIZLI_REDSHIFT", np.float32, None),
+            ("ESTIMATED_REDSHIFT", np.float32, None),
+            ("FLAGS", np.uint8, None),
+            ("COMMENTS", str, None),
+        ]
+    )
+    return columns
+
+
+def output_table(beams):
+    """
+    Create an empty output catalogue.
+
+    Parameters
+    ----------
+    beams : list of str
+        The beams which can be classified, as returned by `beam_names`.
+
+    Returns
+    -------
+    astropy.table.QTable
+        The empty catalogue.
+    """
+    names, dtypes, units = zip(*output_columns(beams))
+    return QTable(names=names, dtype=dtypes, units=units)
+
+
+def encode_quality(values):
+    """
+    Convert beam qualities to their codes.
+
+    Parameters
+    ----------
+    values : str or int or array-like
+        The qualities, either as names or as codes.
+
+    Returns
+    -------
+    numpy.ndarray or int
+        The codes, with 0 for any unrecognised or masked value.
+    """
+    arr = np.ma.filled(np.ma.asarray(values), 0)
+    if arr.dtype.kind in "US":
+        arr = arr.astype(str)
+        codes = np.zeros(arr.shape, dtype=np.uint8)
+        for q, c in QUALITY_CODES.items():
+            codes[arr == q] = c
+    else:
+        codes = np.where((arr >= 1) & (arr <= len(QUALITY_LEVELS)), arr, 0).astype(
+            np.uint8
+        )
+    return codes[()] if codes.ndim == 0 else codes
+
+
+def decode_quality(code):
+    """
+    Convert a quality code to its name.
+
+    Parameters
+    ----------
+    code : int
+        The quality code.
+
+    Returns
+    -------
+    str
+        The name of the quality, or an empty string if none was assigned.
+    """
+    code = int(encode_quality(code))
+    return QUALITY_LEVELS[code - 1] if code > 0 else ""
+
+
+def pack_flags(flags):
+    """
+    Combine the boolean flags into a single integer.
+
+    Parameters
+    ----------
+    flags : dict
+        The value of each flag in ``FLAG_BITS``. Missing flags are assumed
+        to be ``False``.
+
+    Returns
+    -------
+    int
+        The packed flags.
+    """
+    return sum(bit for name, bit in FLAG_BITS.items() if bool(flags.get(name, False)))
+
+
+def unpack_flags(packed):
+    """
+    Split packed flags into their boolean values.
+
+    Parameters
+    ----------
+    packed : int
+        The packed flags, as returned by `pack_flags`.
+
+    Returns
+    -------
+    dict
+        The value of each flag in ``FLAG_BITS``.
+    """
+    packed = int(np.ma.filled(packed, 0))
+    return {name: bool(packed & bit) for name, bit in FLAG_BITS.items()}
+
+
+def encode_record(record):
+    """
+    Convert a classification to the types used in the output catalogue.
+
+    Parameters
+    ----------
+    record : dict
+        The flattened classification. Qualities may be given as names, and
+        flags as separate booleans. Records which have already been encoded
+        are returned unchanged.
+
+    Returns
+    -------
+    dict
+        The encoded classification.
+    """
+    encoded = {}
+    flags = {}
+    for k, v in record.items():
+        if k in FLAG_BITS:
+            flags[k] = v
+        elif k.endswith("_QUALITY") and v is not None:
+            encoded[k] = encode_quality(v)
+        else:
+            encoded[k] = v
+    if len(flags) > 0 and "FLAGS" not in encoded:
+        encoded["FLAGS"] = pack_flags(flags)
+    return encoded
+
+
+def migrate_output(table, template):
+    """
+    Convert an output catalogue to the current schema.
+
+    Catalogues written by earlier versions of `pyGCG` stored the qualities
+    as strings, and each flag as a separate boolean column.
+
+    Parameters
+    ----------
+    table : astropy.table.QTable
+        The output catalogue, as read from disk.
+    template : astropy.table.QTable
+        An empty catalogue with the current schema, as returned by
+        `output_table`.
+
+    Returns
+    -------
+    astropy.table.QTable
+        The converted catalogue. Columns not in ``template`` are kept, and
+        columns missing from ``table`` are masked.
+    """
+    table = table.copy(copy_data=False)
+    if "FLAGS" not in table.colnames and any(k in table.colnames for k in FLAG_BITS):
+        packed = np.zeros(len(table), dtype=np.uint8)
+        for name, bit in FLAG_BITS.items():
+            if name in table.colnames:
+                packed[np.ma.filled(table[name], False).astype(bool)] |= bit
+                table.remove_column(name)
+        table["FLAGS"] = packed
+
+    migrated = QTable()
+    for name in template.colnames:
+        dtype = template[name].dtype
+        if name not in table.colnames:
+            migrated[name] = MaskedColumn(
+                np.zeros(len(table), dtype=dtype), mask=np.ones(len(table), dtype=bool)
+            )
+        elif name.endswith("_QUALITY"):
+            migrated[name] = encode_quality(table[name])
+        elif dtype.kind == "U":
+            # Strings read from FITS files may be bytes
+            migrated[name] = table[name].astype(str)
+        else:
+            migrated[name] = table[name].astype(dtype)
+        unit = getattr(template[name], "unit", None)
+        if unit is not None and getattr(migrated[name], "unit", None) is None:
+            migrated[name] = migrated[name] * unit
+    for name in table.colnames:
+        if name not in migrated.colnames:
+            migrated[name] = table[name]
+    return migrated
@@ -0,0 +1,211 @@
+import os
+from pathlib import Path
+
+import astropy.io.fits as pf
+import astropy.units as u
+import numpy as np
+from astropy.coordinates import SkyCoord
+from astropy.table import Table
+
+from .misc import check_deg
+
+try:
+    from scipy.ndimage import find_objects
+
+    HAS_SCIPY = True
+except:
+    HAS_SCIPY = False
+
+
+def seg_bounding_boxes(seg_data, chunk_rows=256):
+    """
+    Find the bounding box and pixel count of every label in a segmentation map.
+
+    The map is read in blocks of rows, so that a memory-mapped array is never
+    loaded in full.
+
+    Parameters
+    ----------
+    seg_data : array-like
+        The 2D segmentation map, where ``0`` denotes the background.
+    chunk_rows : int, optional
+        The number of rows read at once, by default 256.
+
+    Returns
+    -------
+    astropy.table.Table
+        A table with one row per label, containing the columns ``SEG_ID``,
+        ``NPIX``, ``YMIN``, ``YMAX``, ``XMIN``, and ``XMAX``. The maximum
+        bounds are inclusive.
+    """
+    n_rows, n_cols = seg_data.shape
+    max_label = 0
+    for start in range(0, n_rows, chunk_rows):
+        max_label = max(max_label, int(np.max(seg_data[start : start + chunk_rows])))
+
+    npix = np.zeros(max_label + 1, dtype=np.int64)
+    ymin = np.full(max_label + 1, n_rows, dtype=np.int64)
+    ymax = np.full(max_label + 1, -1, dtype=np.int64)
+    xmin = np.full(max_label + 1, n_cols, dtype=np.int64)
+    xmax = np.full(max_label + 1, -1, dtype=np.int64)
+
+    for start in range(0, n_rows, chunk_rows):
+        chunk = np.clip(seg_data[start : start + chunk_rows], 0, None).astype(
+            np.int64, copy=False
+        )
+        npix += np.bincount(chunk.ravel(), minlength=max_label + 1)
+
+        if HAS_SCIPY:
+            for i, s in enumerate(find_objects(chunk)):
+                if s is None:
+                    continue
+                label = i + 1
+                ymin[label] = min(ymin[label], s[0].start + start)
+                ymax[label] = max(ymax[label], s[0].stop - 1 + start)
+                xmin[label] = min(xmin[label], s[1].start)
+                xmax[label] = max(xmax[label], s[1].stop - 1)
+        else:
+            ys, xs = np.nonzero(chunk > 0)
+            labels = chunk[ys, xs]
+            np.minimum.at(ymin, labels, ys + start)
+            np.maximum.at(ymax, labels, ys + start)
+            np.minimum.at(xmin, labels, xs)
+            np.maximum.at(xmax, labels, xs)
+
+    found = np.flatnonzero(npix > 0)
+    found = found[found > 0]
+    return Table(
+        [found, npix[found], ymin[found], ymax[found], xmin[found], xmax[found]],
+        names=["SEG_ID", "NPIX", "YMIN", "YMAX", "XMIN", "XMAX"],
+    )
+
+
+class SegmentationIndex:
+    """
+    The bounding boxes of all objects in a segmentation map.
+
+    The index is computed once, and stored alongside the segmentation map
+    as ``{name}.bbox.fits``. If that directory is not writeable, the index
+    is stored in ``fallback_dir`` instead. The index is recomputed if the
+    size or modification time of the segmentation map changes.
+
+    Parameters
+    ----------
+    seg_path : str or os.PathLike
+        The path of the segmentation map.
+    fallback_dir : str or os.PathLike, optional
+        An alternative directory in which to store the index.
+    """
+
+    def __init__(self, seg_path, fallback_dir=None):
+        self.seg_path = Path(seg_path)
+        self.fallback_dir = fallback_dir
+        self.table = None
+        self.shape = None
+
+    @property
+    def cache_paths(self):
+        name = self.seg_path.name.removesuffix(".fits") + ".bbox.fits"
+        paths = [self.seg_path.parent / name]
+        if self.fallback_dir is not None:
+            paths.append(Path(self.fallback_dir) / name)
+        return paths
+
+    def load(self):
+        """
+        Read the index from disk, or compute it if no valid copy exists.
+        """
+        stat = os.stat(self.seg_path)
+        for cache_path in self.cache_paths:
+            try:
+                tab = Table.read(cache_path)
+                assert tab.meta["SEGSIZE"] == stat.st_size
+                assert tab.meta["SEGMTIME"] == str(stat.st_mtime_ns)
+                self.table = tab
+                self.shape = (tab.meta["SEGNY"], tab.meta["SEGNX"])
+                return
+            except Exception as e:
+                pass
+
+        print("Indexing segmentation map...")
+        with pf.open(self.seg_path) as hdul:
+            self.shape = hdul[0].shape
+            self.table = seg_bounding_boxes(hdul[0].data)
+        self.table.meta["SEGSIZE"] = stat.st_size
+        self.table.meta["SEGMTIME"] = str(stat.st_mtime_ns)
+        self.table.meta["SEGNY"] = self.shape[0]
+        self.table.meta["SEGNX"] = self.shape[1]
+
+        for cache_path in self.cache_paths:
+            try:
+                cache_path.parent.mkdir(exist_ok=True, parents=True)
+                self.table.write(cache_path, overwrite=True)
+                return
+            except Exception as e:
+                pass
+        print("Could not save the segmentation map index.")
+
+    def bbox(self, seg_id):
+        """
+        Find the bounding box of a single object.
+
+        Parameters
+        ----------
+        seg_id : int
+            The segmentation id of the object.
+
+        Returns
+        -------
+        tuple of int or None
+            The ``(ymin, ymax, xmin, xmax)`` pixel bounds, where the maximum
+            values are inclusive, or ``None`` if the object is not present.
+        """
+        if self.table is None:
+            self.load()
+        idx = np.searchsorted(self.table["SEG_ID"], int(seg_id))
+        if idx >= len(self.table) or self.table["SEG_ID"][idx] != int(seg_id):
+            return None
+        row = self.table[idx]
+        return (
+            int(row["YMIN"]),
+            int(row["YMAX"]),
+            int(row["XMIN"]),
+            int(row["XMAX"]),
+        )
+
+
+def find_ra_dec_columns(q_table, key_ra="ra", key_dec="dec"):
+    if key_ra in q_table.colnames and key_dec in q_table.colnames:
+        return key_ra, key_dec
+
+    print(
+        "No match found for supplied ra, dec keys. Performing automatic search instead."
+    )
+    lower_colnames = np.array([x.lower() for x in q_table.colnames])
+    for r, d in [[key_ra, key_dec], ["ra", "dec"]]:
+        possible_names = []
+        for n in lower_colnames:
+            if d.lower() in n:
+                possible_names.append(n)
+        possible_names = sorted(possible_names, key=lambda x: (len(x), x))
+        for n in possible_names:
+            r_poss = n.replace(d.lower(), r.lower())
+            if r_poss in lower_colnames:
+                return (
+                    q_table.colnames[int((lower_colnames == r_poss).nonzero()[0][0])],
+                    q_table.colnames[int((lower_colnames == n).nonzero()[0][0])],
+                )
+    raise KeyError(f"No columns matching {key_ra}, {key_dec} found.")
+
+
+def pixel_coordinates(q_table, celestial_wcs, key_ra="ra", key_dec="dec"):
+    # Works on a whole table at once, as well as a single row
+    key_ra, key_dec = find_ra_dec_columns(q_table, key_ra=key_ra, key_dec=key_dec)
+
+    new_ra, new_dec = check_deg(q_table[key_ra]), check_deg(q_table[key_dec])
+    if new_ra.unit == u.pix:
+        return new_ra, new_dec
+
+    sc = SkyCoord(new_ra, new_dec)
+    pix_x, pix_y = sc.to_pixel(celestial_wcs)
+    return pix_x * u.pix, pix_y * u.pix
@@ -0,0 +1,131 @@
+import json
+import os
+from pathlib import Path
+
+import astropy.io.fits as pf
+import numpy as np
+from astropy.table import QTable, Table
+
+# Incremented whenever the contents of the snapshot change.
+SESSION_VERSION = 1
+
+
+def file_stamps(paths):
+    """
+    Record the size and modification time of each file.
+
+    Parameters
+    ----------
+    paths : list of str or os.PathLike or None
+        The files to check. Entries of ``None`` are ignored.
+
+    Returns
+    -------
+    dict
+        A dictionary of ``{path: [size, mtime_ns]}``, where the value is
+        ``None`` if the file does not exist.
+    """
+    stamps = {}
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            stat = os.stat(path)
+            stamps[str(path)] = [stat.st_size, stat.st_mtime_ns]
+        except OSError:
+            stamps[str(path)] = None
+    return stamps
+
+
+def config_signature(config, sections=("files", "catalogue", "grisms")):
+    """
+    Summarise the parts of the configuration which determine the queue.
+
+    Parameters
+    ----------
+    config : dict
+        The full configuration.
+    sections : tuple of str, optional
+        The tables of the configuration to include.
+
+    Returns
+    -------
+    str
+        A JSON string, which changes if any of the included keys change.
+    """
+    return json.dumps(
+        {s: config.get(s, {}) for s in sections}, sort_keys=True, default=str
+    )
+
+
+def write_session(path, full_cat, queue_idx, meta):
+    """
+    Save a snapshot of the current session.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the snapshot.
+    full_cat : astropy.table.QTable
+        The deduplicated catalogue, containing only the columns used.
+    queue_idx : array-like
+        The position in ``full_cat`` of each object in the queue, in order.
+    meta : dict
+        Any other information needed to restore the session, including the
+        ``stamps`` and ``signature`` used to validate it. This must be
+        serialisable as JSON.
+    """
+    path = Path(path)
+    meta = dict(meta, version=SESSION_VERSION)
+    primary = pf.PrimaryHDU()
+    # Long strings are split over CONTINUE cards
+    primary.header["SESSION"] = json.dumps(meta)
+    cat_hdu = pf.table_to_hdu(Table(full_cat))
+    cat_hdu.name = "CATALOGUE"
+    queue_hdu = pf.BinTableHDU.from_columns(
+        [
+            pf.Column(
+                name="QUEUE_IDX",
+                format="K",
+                array=np.asarray(queue_idx, dtype=np.int64),
+            )
+        ],
+        name="QUEUE",
+    )
+    tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+    pf.HDUList([primary, cat_hdu, queue_hdu]).writeto(tmp_path, overwrite=True)
+    os.replace(tmp_path, path)
+
+
+def read_session(path, signature):
+    """
+    Load a snapshot, if it is still valid.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the snapshot.
+    signature : str
+        The current output of `config_signature`.
+
+    Returns
+    -------
+    tuple or None
+        ``(full_cat, queue_idx, meta)``, or ``None`` if the snapshot does
+        not exist, or any of the files recorded in it, or the
+        configuration, have changed since it was written.
+    """
+    try:
+        with pf.open(path, memmap=False) as hdul:
+            meta = json.loads(hdul[0].header["SESSION"])
+            if (
+                meta.get("version") != SESSION_VERSION
+                or meta.get("signature") != signature
+                or meta.get("stamps") != file_stamps(meta.get("stamps", {}))
+            ):
+                return None
+            full_cat = QTable.read(hdul["CATALOGUE"])
+            queue_idx = np.asarray(hdul["QUEUE"].data["QUEUE_IDX"], dtype=int)
+    except Exception:
+        return None
+    return full_cat, queue_idx, meta
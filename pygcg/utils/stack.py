@@ -0,0 +1,233 @@
+import numpy as np
+from astropy.visualization import MinMaxInterval
+
+from pygcg.utils.headers import has_extension, stack_metadata
+from pygcg.utils.offsets import HDUOffsetIndex, HDUReader
+from pygcg.utils.stats import partition_percentiles, percentile_interval
+
+
+class StackProduct:
+    """
+    The contents of a grizli stack file, read once per object.
+
+    The file is opened a single time, and shared by both orientation tabs.
+    Each extension is read on first use, by seeking directly to it and
+    memory-mapping its data. Quantities derived from the arrays (the
+    residuals, the beam coverage, and the colourmap limits) are calculated
+    on first use, and then cached.
+
+    Parameters
+    ----------
+    path : str or os.PathLike or None
+        The path of the ``*.stack.fits`` (or ``*.spec2D.fits``) file. If
+        ``None``, the product is empty, and every extension is missing.
+    offsets : HDUOffsetIndex, optional
+        The index used to locate and describe each extension. If not
+        supplied, the file is scanned without caching the result.
+
+    Attributes
+    ----------
+    meta : dict or None
+        The contents of the file, as returned by
+        `pygcg.utils.stack_metadata`, or ``None`` if there is no file.
+    """
+
+    def __init__(self, path, offsets=None):
+        self.path = path
+        self.data = {}
+        self.headers = {}
+        self._residuals = {}
+        self._coverage = {}
+        self._limits = {}
+        self._reader = None
+        self.meta = None
+        if path is None:
+            return
+        if offsets is None:
+            offsets = HDUOffsetIndex()
+        hdus = offsets.get(path)
+        self.meta = stack_metadata(hdus)
+        self._reader = HDUReader(path, hdus)
+
+    def _load(self, ext, extver):
+        key = (ext, extver)
+        if key not in self.data:
+            if not self.has(ext, extver):
+                raise KeyError(key)
+            hdu = self._reader[key]
+            self.data[key] = hdu.data
+            self.headers[key] = hdu.header
+        return key
+
+    def close(self):
+        """
+        Close the file. Any arrays already read remain valid.
+        """
+        if self._reader is not None:
+            self._reader.close()
+
+    def has(self, ext, extver):
+        """
+        Check whether an extension is present.
+
+        Parameters
+        ----------
+        ext : str
+            The extension name. ``"RESIDUALS"`` requires both ``"SCI"`` and
+            ``"MODEL"``.
+        extver : str
+            The extension version, e.g. ``"F115W,72.0"``.
+
+        Returns
+        -------
+        bool
+            ``True`` if the data can be read.
+        """
+        return bool(has_extension(self.meta, ext, extver))
+
+    def get(self, ext, extver):
+        """
+        Get the data of an extension.
+
+        Parameters
+        ----------
+        ext : str
+            The extension name. ``"RESIDUALS"`` returns the science image
+            minus the model.
+        extver : str
+            The extension version.
+
+        Returns
+        -------
+        numpy.ndarray
+            The data array.
+
+        Raises
+        ------
+        KeyError
+            If the extension is not in the file.
+        """
+        if ext != "RESIDUALS":
+            return self.data[self._load(ext, extver)]
+        if extver not in self._residuals:
+            self._residuals[extver] = self.get("SCI", extver) - self.get(
+                "MODEL", extver
+            )
+        return self._residuals[extver]
+
+    def header(self, ext, extver):
+        """
+        Get the header of an extension.
+
+        Parameters
+        ----------
+        ext : str
+            The extension name.
+        extver : str
+            The extension version.
+
+        Returns
+        -------
+        astropy.io.fits.Header
+            The header.
+
+        Raises
+        ------
+        KeyError
+            If the extension is not in the file.
+        """
+        return self.headers[self._load(ext, extver)]
+
+    def coverage(self, extver):
+        """
+        Find the fraction of the wavelength range covered by a beam.
+
+        Parameters
+        ----------
+        extver : str
+            The extension version.
+
+        Returns
+        -------
+        float
+            The fraction of columns in the science image containing any
+            finite, non-zero pixels.
+        """
+        if extver not in self._coverage:
+            data = self.get("SCI", extver)
+            self._coverage[extver] = float(
+                1
+                - np.sum(np.all((~np.isfinite(data)) | (data == 0), axis=0))
+                / data.shape[1]
+            )
+        return self._coverage[extver]
+
+    def limits(self, ext, extver, method):
+        """
+        Find the colourmap limits of an extension.
+
+        Parameters
+        ----------
+        ext : str
+            The extension name. The limits of ``"RESIDUALS"`` are the same as
+            those of ``"SCI"``.
+        extver : str
+            The extension version.
+        method : str
+            One of ``"grizli default"``, ``"Min-max"``, or a percentile such
+            as ``"99.5%"``.
+
+        Returns
+        -------
+        tuple of float
+            The lower and upper limits.
+        """
+        if ext == "RESIDUALS":
+            ext = "SCI"
+        key = (ext, extver, method)
+        if key in self._limits:
+            return self._limits[key]
+
+        # The beams of each extver have the same shape, so their limits are
+        # found together
+        if ext == "KERNEL":
+            exts = [ext]
+        else:
+            exts = [ext] + [
+                e
+                for e in ["SCI", "CONTAM", "MODEL"]
+                if e != ext and self.has(e, extver)
+            ]
+        data = [self.get(e, extver) for e in exts]
+        exts = [e for e, d in zip(exts, data) if d.shape == data[0].shape]
+        data = [d for d in data if d.shape == data[0].shape]
+
+        if method == "grizli default":
+            if ext == "KERNEL":
+                vmax = [1.1 * partition_percentiles(data[0], 99.5)]
+            else:
+                wht = self.get("WHT", extver)
+                clip = wht > 0
+                if clip.sum() == 0:
+                    clip = np.isfinite(wht)
+                avg_rms = 1 / np.median(np.sqrt(wht[clip]))
+                vmax = np.maximum(
+                    1.1
+                    * partition_percentiles(
+                        np.stack([d[clip] for d in data]), 98, per_panel=True
+                    ),
+                    5 * avg_rms,
+                )
+            limits = [(-0.1 * v, v) for v in vmax]
+        elif method == "Min-max":
+            limits = [MinMaxInterval().get_limits(d) for d in data]
+        else:
+            limits = [
+                tuple(v)
+                for v in percentile_interval(
+                    np.stack(data), float(method.replace("%", "")), per_panel=True
+                )
+            ]
+        for e, lim in zip(exts, limits):
+            self._limits[(e, extver, method)] = lim
+        return self._limits[key]
@@ -0,0 +1,226 @@
+import time
+
+import numpy as np
+
+
+def _as_rows(data, per_panel):
+    data = np.asarray(data, dtype=float)
+    if per_panel:
+        return data.reshape(data.shape[0], -1)
+    return data.reshape(1, -1)
+
+
+def _format(out, q, per_panel):
+    if np.ndim(q) == 0:
+        out = out[:, 0]
+    return out if per_panel else out[0]
+
+
+def _partition_rows(rows, q):
+    # Linear interpolation between the closest ranks, as in `np.percentile`
+    n = rows.shape[1]
+    pos = q / 100 * (n - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, n - 1)
+    part = np.partition(rows, np.unique(np.concatenate([lo, hi])), axis=1)
+    frac = pos - lo
+    return part[:, lo] * (1 - frac) + part[:, hi] * frac
+
+
+def partition_percentiles(data, q, per_panel=False):
+    """
+    Calculate exact percentiles, ignoring non-finite values.
+
+    All percentiles are found from a single partition of the data, rather
+    than sorting it.
+
+    Parameters
+    ----------
+    data : array-like
+        The values.
+    q : float or array-like
+        The percentiles, between 0 and 100.
+    per_panel : bool, optional
+        If ``True``, the first axis of ``data`` indexes separate panels
+        (which must have the same shape), and the percentiles of each are
+        calculated together. By default ``False``.
+
+    Returns
+    -------
+    float or numpy.ndarray
+        The percentiles, with a leading axis of panels if ``per_panel`` is
+        set, and a trailing axis if ``q`` is an array. Panels without any
+        finite values give NaN.
+    """
+    rows = _as_rows(data, per_panel)
+    q_arr = np.atleast_1d(np.asarray(q, dtype=float))
+    out = np.full((rows.shape[0], len(q_arr)), np.nan)
+    finite = np.isfinite(rows)
+    if rows.shape[1] > 0 and np.all(finite):
+        out[:] = _partition_rows(rows, q_arr)
+    else:
+        for i in range(rows.shape[0]):
+            values = rows[i][finite[i]]
+            if len(values) > 0:
+                out[i] = _partition_rows(values[np.newaxis], q_arr)[0]
+    return _format(out, q, per_panel)
+
+
+def histogram_percentiles(data, q, per_panel=False, n_bins=4096):
+    """
+    Estimate percentiles from a histogram, ignoring non-finite values.
+
+    Each panel is binned over its own range, and the counts of all panels
+    are found in a single pass.
+
+    Parameters
+    ----------
+    data : array-like
+        The values.
+    q : float or array-like
+        The percentiles, between 0 and 100.
+    per_panel : bool, optional
+        If ``True``, the first axis of ``data`` indexes separate panels
+        (which must have the same shape). By default ``False``.
+    n_bins : int, optional
+        The number of bins used for each panel, by default 4096.
+
+    Returns
+    -------
+    values : float or numpy.ndarray
+        The estimated percentiles, with the same shape as the output of
+        `partition_percentiles`.
+    errors : float or numpy.ndarray
+        The maximum absolute error of each estimate, which is half of the
+        bin width.
+    """
+    rows = _as_rows(data, per_panel)
+    q_arr = np.atleast_1d(np.asarray(q, dtype=float))
+    n_rows = rows.shape[0]
+    finite = np.isfinite(rows)
+    with np.errstate(invalid="ignore"):
+        vmin = np.min(np.where(finite, rows, np.inf), axis=1, initial=np.inf)
+        vmax = np.max(np.where(finite, rows, -np.inf), axis=1, initial=-np.inf)
+    width = (vmax - vmin) / n_bins
+    width = np.where(np.isfinite(width) & (width > 0), width, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        idx = np.floor((rows - vmin[:, np.newaxis]) / width[:, np.newaxis])
+    idx = np.clip(np.nan_to_num(idx, nan=0, posinf=0, neginf=0), 0, n_bins - 1)
+    flat = (np.arange(n_rows)[:, np.newaxis] * n_bins + idx.astype(int))[finite]
+    counts = np.bincount(flat, minlength=n_rows * n_bins).reshape(n_rows, n_bins)
+    cumulative = np.cumsum(counts, axis=1)
+    n = cumulative[:, -1]
+
+    # The bins containing the two ranks either side of each percentile
+    pos = q_arr[np.newaxis] / 100 * np.clip(n[:, np.newaxis] - 1, 0, None)
+    lo = np.floor(pos)
+    hi = np.minimum(lo + 1, np.clip(n[:, np.newaxis] - 1, 0, None))
+    frac = pos - lo
+
+    def rank_value(rank):
+        bins = np.sum(cumulative[:, np.newaxis, :] <= rank[:, :, np.newaxis], axis=2)
+        bins = np.clip(bins, 0, n_bins - 1)
+        return vmin[:, np.newaxis] + (bins + 0.5) * width[:, np.newaxis]
+
+    with np.errstate(invalid="ignore"):
+        out = rank_value(lo) * (1 - frac) + rank_value(hi) * frac
+    out = np.clip(out, vmin[:, np.newaxis], vmax[:, np.newaxis])
+    out[n == 0] = np.nan
+    errors = np.broadcast_to(0.5 * width[:, np.newaxis], out.shape).copy()
+    errors[n == 0] = np.nan
+    return _format(out, q, per_panel), _format(errors, q, per_panel)
+
+
+def percentile_interval(data, percentile, per_panel=False):
+    """
+    Find the limits enclosing a central percentage of the values.
+
+    This is equivalent to `astropy.visualization.PercentileInterval`.
+
+    Parameters
+    ----------
+    data : array-like
+        The values.
+    percentile : float
+        The percentage of values to enclose, e.g. 99.5.
+    per_panel : bool, optional
+        If ``True``, the first axis of ``data`` indexes separate panels.
+
+    Returns
+    -------
+    numpy.ndarray
+        The lower and upper limits, along the last axis.
+    """
+    lower = (100 - float(percentile)) / 2
+    return partition_percentiles(data, [lower, 100 - lower], per_panel=per_panel)
+
+
+def benchmark_percentiles(
+    shape=(3, 60, 400), q=(0.5, 2, 98, 99.5), n_bins=4096, repeat=20, seed=0
+):
+    """
+    Compare the speed and accuracy of the percentile methods.
+
+    The exact values are calculated with `np.percentile`, one panel and one
+    percentile at a time, as in earlier versions of `pyGCG`.
+
+    Parameters
+    ----------
+    shape : tuple of int, optional
+        The shape of the simulated data. The first axis indexes panels.
+    q : tuple of float, optional
+        The percentiles to calculate.
+    n_bins : int, optional
+        The number of bins used by `histogram_percentiles`.
+    repeat : int, optional
+        The number of times each method is run.
+    seed : int, optional
+        The seed of the random number generator.
+
+    Returns
+    -------
+    dict
+        The mean time in seconds (``"time"``) and the maximum absolute
+        error (``"error"``) of each method, and the maximum error bound of
+        the histogram (``"bound"``).
+    """
+    rng = np.random.default_rng(seed)
+    data = rng.normal(size=shape) + rng.exponential(scale=5, size=shape) * (
+        rng.random(size=shape) < 0.02
+    )
+    q = np.asarray(q, dtype=float)
+
+    def run(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        return result, (time.perf_counter() - start) / repeat
+
+    exact, t_exact = run(
+        lambda: np.array([[np.percentile(d, p) for p in q] for d in data])
+    )
+    part, t_part = run(lambda: partition_percentiles(data, q, per_panel=True))
+    (hist, bound), t_hist = run(
+        lambda: histogram_percentiles(data, q, per_panel=True, n_bins=n_bins)
+    )
+
+    results = {
+        "time": {"percentile": t_exact, "partition": t_part, "histogram": t_hist},
+        "error": {
+            "partition": float(np.max(np.abs(part - exact))),
+            "histogram": float(np.max(np.abs(hist - exact))),
+        },
+        "bound": float(np.max(bound)),
+    }
+    for name, t in results["time"].items():
+        print(
+            f"{name:>10}: {t * 1e3:8.3f} ms, "
+            f"max error {results['error'].get(name, 0.0):.2e}"
+        )
+    print(f"Histogram error bound: {results['bound']:.2e}")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_percentiles()
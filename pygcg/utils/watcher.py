@@ -0,0 +1,52 @@
+import queue
+import threading
+
+from .products import walk_tree
+
+
+class ProductWatcher(threading.Thread):
+    """
+    Poll an extractions directory for new data products in the background.
+
+    The watcher only reads the filesystem. Each set of changes is placed on
+    ``updates``, to be merged into the `ProductIndex` from the main thread
+    with `ProductIndex.merge`, in the order received.
+
+    Parameters
+    ----------
+    index : ProductIndex
+        The index to watch. Its directory listings are used as the starting
+        point, so only subsequent changes are reported.
+    interval : float, optional
+        The time in seconds between each scan, by default 30.
+    n_threads : int, optional
+        The number of threads used to walk the directory tree.
+    """
+
+    def __init__(self, index, interval=30.0, n_threads=1):
+        super().__init__(daemon=True)
+        self.root = index.root
+        self.dirs = index.dirs
+        self.interval = float(interval)
+        self.n_threads = n_threads
+        self.updates = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                new_dirs, changed = walk_tree(
+                    self.root,
+                    suffix=".fits",
+                    n_threads=self.n_threads,
+                    cache=self.dirs,
+                )
+            except Exception as e:
+                print(f"Could not scan {self.root} for new objects: {e}")
+                continue
+            self.dirs = new_dirs
+            if len(changed) > 0:
+                self.updates.put((new_dirs, changed))
+
+    def stop(self):
+        self._stop_event.set()
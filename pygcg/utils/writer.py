@@ -0,0 +1,82 @@
+import os
+import queue
+import threading
+from pathlib import Path
+
+
+class CatalogueWriter(threading.Thread):
+    """
+    Write the output catalogue to disk in a background thread.
+
+    Snapshots of the catalogue are passed through a queue. If several are
+    waiting, only the most recent is written. Each snapshot is written to a
+    temporary file in the same directory, which then atomically replaces
+    the catalogue, so that a partially written catalogue is never left on
+    disk.
+
+    The outcome of each write is placed on ``results``, to be read by the
+    main thread, as either ``("written", tag, None)`` or ``("error", tag,
+    exception)``.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The location of the output catalogue.
+    """
+
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = Path(path)
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+
+    def submit(self, table, tag=None):
+        """
+        Queue a snapshot of the catalogue to be written.
+
+        Parameters
+        ----------
+        table : astropy.table.Table
+            The catalogue. A copy is taken, so that the original can be
+            modified straight away.
+        tag : optional
+            Returned with the result, to identify the snapshot.
+        """
+        self.jobs.put((table.copy(), tag))
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            stop = job is None
+            # Skip any snapshots superseded by a later one
+            while not stop:
+                try:
+                    next_job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if next_job is None:
+                    stop = True
+                else:
+                    job = next_job
+            if job is not None:
+                self.write(*job)
+            if stop:
+                return
+
+    def write(self, table, tag=None):
+        tmp_path = self.path.with_name(f".{self.path.stem}.tmp{self.path.suffix}")
+        try:
+            table.write(tmp_path, overwrite=True)
+            with open(tmp_path, mode="rb+") as fp:
+                os.fsync(fp.fileno())
+            os.replace(tmp_path, self.path)
+            self.results.put(("written", tag, None))
+        except Exception as e:
+            self.results.put(("error", tag, e))
+
+    def stop(self):
+        """
+        Write any remaining snapshots, and wait for the thread to finish.
+        """
+        self.jobs.put(None)
+        self.join()
@@ -6,7 +6,7 @@ import numpy as np
 from astropy.coordinates import SkyCoord
 from CTkMessagebox import CTkMessagebox
 
-from pygcg.utils import ValidateFloatVar
+from pygcg.utils import ObjectQueue, ValidateFloatVar
 
 from .base_window import BaseWindow
 
@@ -144,6 +144,8 @@ class SearchWindow(BaseWindow):
             self.focus_force()
             return
 
+        self._root().search_active = True
+        self._root().queue_idx = self._root().queue_idx[match_idx]
         self._root().id_col = self.ids_arr
         self._root().seg_id_col = self._root().seg_id_col[match_idx]
         self._root().cat = self._root().cat[match_idx]
@@ -167,6 +169,8 @@ class SearchWindow(BaseWindow):
                 unit="deg",
             )
 
+        self._root().queue = ObjectQueue(self._root().id_col, self._root().seg_id_col)
+
         self._root().current_gal_id.set(self._root().id_col[0])
         self._root().tab_row = self._root().cat[0]
         self._root().seg_id = self._root().seg_id_col[0]
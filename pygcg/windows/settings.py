@@ -154,6 +154,7 @@ class SettingsWindow(ctk.CTkToplevel):
             "Prep directory",
             "Cube filepath",
             "Temporary directory",
+            "Manifest filepath",
         ]
         backend_names = [
             "out_dir",
@@ -162,8 +163,9 @@ class SettingsWindow(ctk.CTkToplevel):
             "prep_dir",
             "cube_path",
             "temp_dir",
+            "manifest_path",
         ]
-        is_dir = [1, 1, 0, 1, 0, 1]
+        is_dir = [1, 1, 0, 1, 0, 1, 0]
 
         additional_settings = []
 